@@ -1,9 +1,101 @@
-from flask import Flask, request, send_from_directory, jsonify
+import json
+import logging
+import os
+from flask import Flask, Response, request, send_file, send_from_directory, jsonify
 import model_util  # Import the sentiment analysis utility
+import bulk
+import jobs
+import metrics
+import transcripts
+from model_registry import registry
+from inference_scheduler import QueueFullError
+from cache import transcript_cache, result_cache, result_key
 
 # Initialize Flask app
 app = Flask(__name__, static_folder='../frontend/dist', static_url_path='/')
 
+# Debug output is gated by the log level (SENTIMENT_LOG_LEVEL=DEBUG to see received inputs)
+logging.basicConfig(level=os.environ.get('SENTIMENT_LOG_LEVEL', 'INFO'))
+logger = logging.getLogger(__name__)
+
+# Transcript source; set TRANSCRIPT_FIXTURE_DIR to read local transcript files instead of YouTube
+transcript_fetcher = transcripts.get_fetcher()
+
+def fetch_transcript(video_id: str) -> list:
+    """
+    Retrieves the transcript for the given YouTube video ID, from the cache when possible.
+    """
+    def fetch():
+        with metrics.timed('transcript_fetch'):
+            return transcript_fetcher.fetch(video_id)
+
+    transcript = transcript_cache.get_or_set(video_id, fetch)
+    metrics.request_size.observe('video_seconds', transcript[-1]['start'] + transcript[-1]['duration'])
+    return transcript
+
+def get_youtube_result_key(video_id: str, use_custom_model: bool) -> str:
+    """
+    Builds the result cache key for a YouTube analysis with the selected model.
+
+    The segment split is derived from the transcript, so it is not part of the key; that way
+    a cached result is found without fetching the transcript again.
+    """
+    return result_key(
+        video_id=video_id,
+        model=model_util.model_name(use_custom_model),
+        model_version=model_util.model_version(use_custom_model),
+    )
+
+def stream_error_message(error: Exception) -> str:
+    """
+    Returns the message sent to the client when a streamed analysis fails part way through.
+    """
+    if isinstance(error, QueueFullError):
+        return 'Server is busy, please try again later'
+    logger.exception('Streaming analysis failed')
+    return 'Analysis failed'
+
+def stream_response(results) -> Response:
+    """
+    Streams results as NDJSON, or as Server-Sent Events if the client accepts `text/event-stream`.
+
+    Args:
+    - results (Iterable[list]): Results to send, one message each.
+
+    Errors raised while streaming end the stream with a final error record: `{"error": ...}`
+    for NDJSON, an `error` event for SSE.
+
+    Returns:
+    - A streaming Flask response.
+    """
+    if request.accept_mimetypes.best_match(['application/x-ndjson', 'text/event-stream']) == 'text/event-stream':
+        def generate():
+            try:
+                for result in results:
+                    yield f'data: {json.dumps(result)}\n\n'
+            except Exception as e:
+                # The status line is already sent, so report the failure in the stream itself
+                yield f'event: error\ndata: {json.dumps({"error": stream_error_message(e)})}\n\n'
+                return
+            yield 'event: end\ndata: {}\n\n'
+        return Response(generate(), mimetype='text/event-stream', headers={'Cache-Control': 'no-cache'})
+
+    def generate():
+        try:
+            for result in results:
+                yield json.dumps(result) + '\n'
+        except Exception as e:
+            yield json.dumps({'error': stream_error_message(e)}) + '\n'
+    # Tell proxies such as nginx not to buffer the stream
+    return Response(generate(), mimetype='application/x-ndjson', headers={'X-Accel-Buffering': 'no'})
+
+@app.errorhandler(QueueFullError)
+def handle_queue_full(error):
+    """
+    Rejects requests with 503 when the inference queue is overloaded, so clients can retry later.
+    """
+    return jsonify({'error': 'Server is busy, please try again later'}), 503
+
 # Serve the frontend (e.g., React/Vue/Angular app) from the 'dist' folder
 @app.route('/')
 def serve():
@@ -39,16 +131,10 @@ def analyze_text_prog():
         return jsonify({'error': 'No Text provided'}), 400  # Return an error if 'text' is missing
 
     # Log the received text for debugging purposes
-    print(f'Received Text: {text}')
+    logger.debug('Received Text: %s', text)
 
     # Calculate the maximum word count per segment based on text length
-    words_count = len(text.split(' '))
-    max_word_count = (
-        20 if words_count <= 100 else
-        50 if words_count <= 250 else
-        100 if words_count <= 250 else
-        150
-    )
+    max_word_count = model_util.get_max_word_count(text)
 
     # Perform sentiment analysis using the imported utility function
     out = model_util.get_segmented_sentiment_wordcount(
@@ -72,8 +158,6 @@ def analyze_youtube():
     Returns:
     - JSON response containing the sentiment analysis results.
     """
-    from youtube_transcript_api import YouTubeTranscriptApi
-
     # Parse JSON data from the incoming request
     data = request.get_json()
 
@@ -81,31 +165,220 @@ def analyze_youtube():
     video_id = data.get('video_id')
     use_custom_model = data.get('use_custom_model')
 
-    print(f'Received video id: {video_id}')
+    logger.debug('Received video id: %s', video_id)
 
-    # Retrieve the transcript for the given YouTube video ID
-    transcript = YouTubeTranscriptApi.get_transcript(video_id)
+    # Reuse a previous result for the same video and model version, without touching the transcript
+    key = get_youtube_result_key(video_id, use_custom_model)
+    out = result_cache.get(key)
 
-    # Calculate the total video length using the last transcript segment
-    video_length = transcript[-1]['start'] + transcript[-1]['duration']
+    if out is None:
+        # Retrieve the transcript for the given YouTube video ID, from the cache when possible
+        transcript = fetch_transcript(video_id)
 
-    # Determine the segment split duration based on video length
-    second_split = (
-        20 if video_length <= 150 else
-        40 if video_length <= 300 else
-        60
-    )
+        # Determine the segment split duration based on video length
+        second_split = model_util.get_second_split(transcript)
 
-    # Perform sentiment analysis on the video transcript using the imported utility function
-    out = model_util.get_segmented_sentiment_youtubecaption(
-        data=transcript, 
-        second=second_split, 
-        use_custom_model=use_custom_model
-    )
+        # Perform sentiment analysis on the video transcript using the imported utility function
+        out = model_util.get_segmented_sentiment_youtubecaption(
+            data=transcript, 
+            second=second_split, 
+            use_custom_model=use_custom_model
+        )
+        result_cache.set(key, out)
 
     # Return the sentiment analysis result as a JSON response
     return jsonify({'message': 'Text sentiment analyzed successfully', 'result': out}), 200
 
+@app.route('/api/analyze-text-prog/stream', methods=['POST'])
+def analyze_text_prog_stream():
+    """
+    Streaming variant of `/api/analyze-text-prog`.
+
+    Request JSON payload:
+    - text (str): The text to analyze.
+    - use_custom_model (bool): Whether to use the custom sentiment analysis model.
+
+    Returns:
+    - NDJSON (or SSE) stream with one [negative, positive, starting word index] list per segment,
+      sent as soon as the segment is scored.
+    """
+    data = request.get_json()
+    text = data.get('text')
+    use_custom_model = data.get('use_custom_model')
+
+    if not text:
+        return jsonify({'error': 'No Text provided'}), 400
+
+    results = model_util.iter_segmented_sentiment_wordcount(
+        text=text,
+        max_word_count=model_util.get_max_word_count(text),
+        use_custom_model=use_custom_model
+    )
+    return stream_response(results)
+
+@app.route('/api/analyze-youtube/stream', methods=['POST'])
+def analyze_youtube_stream():
+    """
+    Streaming variant of `/api/analyze-youtube`.
+
+    Request JSON payload:
+    - video_id (str): The YouTube video ID to analyze.
+    - use_custom_model (bool): Whether to use the custom sentiment analysis model.
+
+    Returns:
+    - NDJSON (or SSE) stream with one [negative, positive, start time] list per segment,
+      sent as soon as the segment is scored.
+    """
+    data = request.get_json()
+    video_id = data.get('video_id')
+    use_custom_model = data.get('use_custom_model')
+
+    if not video_id:
+        return jsonify({'error': 'No video id provided'}), 400
+
+    # A cached result is streamed out as is
+    key = get_youtube_result_key(video_id, use_custom_model)
+    cached = result_cache.get(key)
+    if cached is not None:
+        return stream_response(cached)
+
+    transcript = fetch_transcript(video_id)
+    second_split = model_util.get_second_split(transcript)
+
+    def results():
+        # Keep the (small) list of scores so a completed stream can be cached
+        out = []
+        for result in model_util.iter_segmented_sentiment_youtubecaption(
+            data=transcript,
+            second=second_split,
+            use_custom_model=use_custom_model
+        ):
+            out.append(result)
+            yield result
+        result_cache.set(key, out)
+
+    return stream_response(results())
+
+@app.route('/api/cache-stats', methods=['GET'])
+def cache_stats():
+    """
+    API endpoint reporting hit/miss counters of this worker's caches.
+
+    Returns:
+    - JSON response with the stats of the transcript and result caches.
+    """
+    return jsonify({'transcript': transcript_cache.get_stats(), 'result': result_cache.get_stats()}), 200
+
+@app.route('/api/models', methods=['GET'])
+def model_stats():
+    """
+    API endpoint reporting which models this worker has loaded, their load time and memory usage.
+
+    Returns:
+    - JSON response with the stats of every registered model.
+    """
+    return jsonify(registry.stats()), 200
+
+@app.route('/api/jobs', methods=['POST'])
+def submit_job():
+    """
+    API endpoint for submitting a batch analysis job.
+
+    Request JSON payload:
+    - items (list): Items to analyze, each a dict with "text" or "video_id" and an optional "id".
+    - use_custom_model (bool): Whether to use the custom sentiment analysis model.
+    - format (str): Output format, "ndjson" (default) or "parquet".
+
+    Returns:
+    - JSON response with the job id to poll.
+    """
+    data = request.get_json()
+    items = data.get('items')
+    output_format = data.get('format', 'ndjson')
+
+    # Local transcript files are only allowed from the CLI, not from remote clients
+    if not items or not all(isinstance(item, dict) and ('text' in item or 'video_id' in item) for item in items):
+        return jsonify({'error': 'Every item needs a "text" or "video_id"'}), 400
+    if output_format not in ('ndjson', 'parquet'):
+        return jsonify({'error': 'format must be "ndjson" or "parquet"'}), 400
+    if output_format == 'parquet' and not bulk.parquet_available():
+        return jsonify({'error': 'Parquet output is not available on this server (pyarrow is not installed)'}), 400
+
+    items = [{key: item[key] for key in ('id', 'text', 'video_id') if key in item} for item in items]
+    job_id = jobs.submit(items, use_custom_model=data.get('use_custom_model'), output_format=output_format)
+    return jsonify({'message': 'Job submitted', 'job_id': job_id}), 202
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    """
+    API endpoint for polling a batch job.
+
+    Returns:
+    - JSON response with the job state ("queued", "running", "interrupted", "done" or "failed") and progress.
+    """
+    path = jobs.job_dir(job_id)
+    if path is None:
+        return jsonify({'error': 'Unknown job'}), 404
+    return jsonify(jobs.get_status(path)), 200
+
+@app.route('/api/jobs/<job_id>/resume', methods=['POST'])
+def resume_job(job_id):
+    """
+    API endpoint for resuming a job interrupted by a restart. Finished items are not redone.
+    """
+    path = jobs.job_dir(job_id)
+    if path is None:
+        return jsonify({'error': 'Unknown job'}), 404
+    state = jobs.get_status(path)['state']
+    if state == 'done':
+        return jsonify({'error': 'Job is already done'}), 409
+    if state in ('queued', 'running'):
+        return jsonify({'error': f'Job is already {state}'}), 409
+    jobs.resume(path)
+    return jsonify({'message': 'Job resumed', 'job_id': job_id}), 202
+
+@app.route('/api/jobs/<job_id>/results', methods=['GET'])
+def job_results(job_id):
+    """
+    API endpoint for downloading the results of a batch job.
+
+    Returns:
+    - The NDJSON results (partial while the job runs) or, for finished Parquet jobs, the Parquet file.
+    """
+    path = jobs.job_dir(job_id)
+    if path is None:
+        return jsonify({'error': 'Unknown job'}), 404
+
+    status = jobs.get_status(path)
+    output = jobs.output_path(path, status)
+    if status['format'] == 'parquet' and status['state'] == 'done':
+        return send_file(output, mimetype='application/vnd.apache.parquet')
+
+    checkpoint = jobs.checkpoint_path(path, status)
+    if not os.path.exists(checkpoint):
+        return Response('', mimetype='application/x-ndjson')
+    return send_file(checkpoint, mimetype='application/x-ndjson')
+
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    """
+    Exposes per-stage timings, request sizes and cache counters of all workers, and the model
+    load stats and scheduler queue sizes of this worker, in the Prometheus text format.
+    """
+    model_stats = registry.stats()
+    extra_lines = (
+        metrics.gauge_lines('sentiment_model_load_seconds', 'Time taken to load each model.', [
+            ({'model': name}, stats.get('load_seconds')) for name, stats in model_stats.items()
+        ])
+        + metrics.gauge_lines('sentiment_model_rss_delta_bytes', 'Resident memory added by loading each model.', [
+            ({'model': name}, stats.get('rss_delta_bytes')) for name, stats in model_stats.items()
+        ])
+        + metrics.gauge_lines('sentiment_scheduler_queue_size', 'Windows waiting for micro-batched inference.', [
+            ({'model': name}, size) for name, size in model_util.scheduler_queue_sizes().items()
+        ])
+    )
+    return Response(metrics.render(extra_lines), mimetype='text/plain; version=0.0.4')
+
 # Run the Flask app in debug mode (useful for development)
 if __name__ == '__main__':
     app.run(debug=True)
@@ -0,0 +1,69 @@
+"""
+Compares one-model-call-per-segment scoring against the batched engine.
+
+Run from the `backend` directory:
+    python -m benchmarks.bench_batching --minutes 60 --batch-size 32
+    python -m benchmarks.bench_batching --minutes 60 --window-mode word
+"""
+import argparse
+from time import perf_counter
+
+import model_util
+from benchmarks.synthetic import make_transcript
+from model_registry import registry
+
+def old_total_sentiment(text, use_custom_model):
+    """Faithful copy of the original `get_total_sentiment`: one model call on the word chunks of one segment."""
+    chunks = model_util.chunk_text(text=text, max_word_count=100, overlap=50)
+    result = registry.get('distilbert')(chunks) if not use_custom_model else registry.get('custom').predict(chunks)
+    all_probabilities = model_util.to_probabilities(result, use_custom_model)
+    return [
+        sum(p[0] for p in all_probabilities) / len(chunks),
+        sum(p[1] for p in all_probabilities) / len(chunks)
+    ]
+
+def per_segment(transcript, second, use_custom_model):
+    """Old behaviour: the original segmentation, then one model call per segment."""
+    segments = {}
+    for caption in transcript:
+        segments.setdefault(int(caption['start'] / second), []).append(caption['text'])
+
+    # Keep empty gap segments, like `get_segmented_sentiment_youtubecaption`, so results line up
+    return [
+        old_total_sentiment(text=''.join(t + ' ' for t in segments.get(idx, [])), use_custom_model=use_custom_model)
+        for idx in range(max(segments) + 1)
+    ]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--minutes', type=float, default=60, help='Length of the synthetic video')
+    parser.add_argument('--second', type=int, default=60, help='Segment length in seconds')
+    parser.add_argument('--batch-size', type=int, default=model_util.BATCH_SIZE, help='Chunks per model call')
+    parser.add_argument('--window-mode', choices=['token', 'word'], default=model_util.WINDOW_MODE, help='How segments are split into windows')
+    parser.add_argument('--custom', action='store_true', help='Benchmark the custom SVR model instead of DistilBERT')
+    args = parser.parse_args()
+
+    transcript = make_transcript(args.minutes)
+    model_util.BATCH_SIZE = args.batch_size
+    model_util.WINDOW_MODE = args.window_mode
+
+    t0 = perf_counter()
+    baseline = per_segment(transcript, args.second, args.custom)
+    t_baseline = perf_counter() - t0
+
+    t0 = perf_counter()
+    batched = model_util.get_segmented_sentiment_youtubecaption(data=transcript, second=args.second, use_custom_model=args.custom)
+    t_batched = perf_counter() - t0
+
+    # Batching may change padding, so expect tiny floating point differences in word mode;
+    # token mode uses different windows, so larger differences are expected there
+    assert len(baseline) == len(batched)
+    max_diff = max(abs(a[1] - b[1]) for a, b in zip(baseline, batched))
+
+    print(f'Segments: {len(batched)}, captions: {len(transcript)}')
+    print(f'Per segment: {t_baseline:.2f}s')
+    print(f'Batched (batch_size={args.batch_size}, window_mode={args.window_mode}): {t_batched:.2f}s')
+    print(f'Speedup: {t_baseline / t_batched:.1f}x, max probability difference: {max_diff:.2e}')
+
+if __name__ == '__main__':
+    main()
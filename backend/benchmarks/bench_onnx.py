@@ -0,0 +1,80 @@
+"""
+CPU benchmark of the DistilBERT inference backends: PyTorch, ONNX Runtime fp32 and int8.
+
+Each backend scores the same synthetic token windows through `model_util.distilbert_on_ids`,
+the path used by the app. Reports latency per batch, throughput, memory growth from loading
+the model, and the parity with the PyTorch outputs.
+
+Run from the `backend` directory, after exporting the ONNX models:
+    python onnx_backend.py export --quantize
+    python -m benchmarks.bench_onnx --windows 512 --batch-size 32
+"""
+import argparse
+from time import perf_counter
+
+import numpy as np
+
+import model_util
+from benchmarks.synthetic import make_text
+from model_registry import ModelRegistry, load_distilbert, load_tokenizer
+
+def load_backend(name):
+    """
+    Loads the DistilBERT backend `name` in a fresh registry, so its load stats are separate.
+    """
+    import model_registry
+    model_registry.DISTILBERT_BACKEND = name
+    registry = ModelRegistry()
+    registry.register('distilbert', load_distilbert)
+    registry.register('tokenizer', load_tokenizer)
+    registry.get('distilbert')
+    return registry
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--windows', type=int, default=512, help='Number of windows to score')
+    parser.add_argument('--batch-size', type=int, default=32, help='Windows per model call')
+    parser.add_argument('--backends', nargs='+', default=['torch', 'onnx', 'onnx-int8'], help='Backends to compare')
+    args = parser.parse_args()
+
+    # Tokenize once; every backend uses the same vocabulary
+    reference = load_backend('torch')
+    model_util.registry = reference
+    windows = [
+        model_util.chunk_tokens(make_text(word_count=100, seed=i))[0].input_ids
+        for i in range(args.windows)
+    ]
+    batches = [windows[i:i + args.batch_size] for i in range(0, len(windows), args.batch_size)]
+
+    baseline = None
+    for name in args.backends:
+        registry = reference if name == 'torch' else load_backend(name)
+        model_util.registry = registry
+
+        model_util.distilbert_on_ids(batches[0])  # Warm up
+
+        latencies = []
+        probabilities = []
+        for batch in batches:
+            t0 = perf_counter()
+            probabilities.extend(model_util.distilbert_on_ids(batch))
+            latencies.append(perf_counter() - t0)
+
+        positive = np.array(probabilities)[:, 1]
+        if baseline is None:
+            baseline = positive
+        stats = registry.stats()['distilbert']
+        rss = stats['rss_delta_bytes']
+
+        print(
+            f'{name:<10} '
+            f'p50={np.median(latencies) * 1000:7.1f}ms/batch  '
+            f'throughput={len(windows) / sum(latencies):7.1f} windows/s  '
+            f'load={stats["load_seconds"]:5.1f}s  '
+            f'rss={rss / 2 ** 20 if rss is not None else float("nan"):7.1f}MiB  '
+            f'max_diff={np.abs(positive - baseline).max():.2e}  '
+            f'label_agreement={np.mean((positive > 0.5) == (baseline > 0.5)):.3f}'
+        )
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+"""
+Load test of the micro-batching scheduler against one model call per request.
+
+Uses a stubbed model whose cost is a fixed per-call overhead plus a per-item cost, with
+only one call running at a time (like a torch model using every core), so the numbers
+do not depend on the real models being installed.
+
+Run from the `backend` directory:
+    python -m benchmarks.loadtest_scheduler --concurrency 16 --requests 400
+"""
+import argparse
+import random
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from inference_scheduler import MicroBatchScheduler
+
+class StubModel:
+    """
+    Fake model: each call holds the model lock for `overhead + per_item * len(items)` seconds.
+    """
+    def __init__(self, overhead_ms: float, per_item_ms: float):
+        self.overhead = overhead_ms / 1000
+        self.per_item = per_item_ms / 1000
+        self.lock = threading.Lock()
+        self.calls = 0
+
+    def predict(self, items):
+        with self.lock:
+            self.calls += 1
+            time.sleep(self.overhead + self.per_item * len(items))
+        return [[0.5, 0.5] for _ in items]
+
+def run(name, score, concurrency, request_sizes):
+    """
+    Sends every request through `score` from `concurrency` threads and prints latency stats.
+    """
+    latencies = []
+
+    def one(size):
+        t0 = time.perf_counter()
+        score(list(range(size)))
+        latencies.append(time.perf_counter() - t0)
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, request_sizes))
+    elapsed = time.perf_counter() - t0
+
+    latencies.sort()
+    p50 = statistics.median(latencies) * 1000
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000
+    print(f'{name:<10} p50={p50:8.1f}ms  p99={p99:8.1f}ms  rps={len(request_sizes) / elapsed:8.1f}')
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--concurrency', type=int, default=16, help='Number of concurrent clients')
+    parser.add_argument('--requests', type=int, default=400, help='Total number of requests')
+    parser.add_argument('--min-items', type=int, default=1, help='Minimum windows per request')
+    parser.add_argument('--max-items', type=int, default=8, help='Maximum windows per request')
+    parser.add_argument('--overhead-ms', type=float, default=10, help='Stub model cost per call')
+    parser.add_argument('--per-item-ms', type=float, default=1, help='Stub model cost per window')
+    parser.add_argument('--max-batch-size', type=int, default=32, help='Scheduler maximum batch size')
+    parser.add_argument('--max-wait-ms', type=float, default=5, help='Scheduler maximum wait time')
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    request_sizes = [rng.randint(args.min_items, args.max_items) for _ in range(args.requests)]
+
+    direct_model = StubModel(args.overhead_ms, args.per_item_ms)
+    run('direct', direct_model.predict, args.concurrency, request_sizes)
+
+    scheduled_model = StubModel(args.overhead_ms, args.per_item_ms)
+    scheduler = MicroBatchScheduler(
+        predict_fn=scheduled_model.predict,
+        max_batch_size=args.max_batch_size,
+        max_wait_ms=args.max_wait_ms,
+        max_queue_size=args.concurrency * args.max_items,
+        submit_timeout=60,
+    )
+    run('scheduled', lambda items: scheduler.submit(items).result(), args.concurrency, request_sizes)
+    scheduler.stop()
+
+    print(f'Model calls: direct={direct_model.calls}, scheduled={scheduled_model.calls}')
+
+if __name__ == '__main__':
+    main()
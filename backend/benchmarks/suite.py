@@ -0,0 +1,162 @@
+"""
+Reproducible benchmark suite over synthetic transcripts and texts of increasing size.
+
+Every case runs in a fresh process so its peak memory is measured on its own. Besides the
+peak of the whole process, which is mostly the model weights, each case reports how much
+the resident memory grew while the input was analyzed. Results are written as JSON lines;
+pass a previous run with --baseline to fail on throughput or memory growth regressions.
+
+Run from the `backend` directory:
+    python -m benchmarks.suite --output bench_results.jsonl
+    python -m benchmarks.suite --baseline bench_results.jsonl --tolerance 0.2
+"""
+import argparse
+import json
+import multiprocessing
+import resource
+import sys
+import threading
+from time import perf_counter
+
+# Transcript lengths in minutes (1 minute to 5 hours) and text lengths in words
+TRANSCRIPT_MINUTES = (1, 10, 60, 300)
+TEXT_WORDS = (100, 1_000, 10_000, 100_000)
+
+def peak_rss_bytes() -> int:
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+class RssSampler:
+    """
+    Samples the resident memory of this process in a thread, keeping the largest value.
+    """
+    def __init__(self, interval: float = 0.005):
+        from model_registry import current_rss
+        self.current_rss = current_rss
+        self.interval = interval
+        self.peak = current_rss() or 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, self.current_rss() or 0)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, self.current_rss() or 0)
+
+def run_case(case: dict) -> dict:
+    """
+    Runs one benchmark case in the current process and returns its measurements.
+    """
+    import model_util
+    from benchmarks.synthetic import make_text, make_transcript
+    from model_registry import current_rss
+
+    use_custom_model = case['model'] == 'custom'
+
+    # Load the models and warm up outside the timing
+    model_util.get_segmented_sentiment_wordcount(text=make_text(50), max_word_count=20, use_custom_model=use_custom_model)
+
+    if case['kind'] == 'transcript':
+        data = make_transcript(case['size'])
+        run = lambda: model_util.get_segmented_sentiment_youtubecaption(
+            data=data, second=model_util.get_second_split(data), use_custom_model=use_custom_model,
+        )
+        work = case['size'] * 60  # Seconds of video
+    else:
+        text = make_text(case['size'])
+        run = lambda: model_util.get_segmented_sentiment_wordcount(
+            text=text, max_word_count=model_util.get_max_word_count(text), use_custom_model=use_custom_model,
+        )
+        work = case['size']  # Words
+
+    # Memory after the models are loaded and warmed up, so the growth below depends on the input only
+    rss_before = current_rss() or 0
+    with RssSampler() as sampler:
+        t0 = perf_counter()
+        segments = len(run())
+        elapsed = perf_counter() - t0
+
+    return {
+        **case,
+        'seconds': elapsed,
+        'segments': segments,
+        'throughput': work / elapsed,  # Video seconds or words per second
+        'peak_rss_bytes': peak_rss_bytes(),
+        'rss_growth_bytes': sampler.peak - rss_before,  # Extra memory used by the analysis itself
+    }
+
+def case_name(case: dict) -> str:
+    return f"{case['kind']}:{case['size']}:{case['model']}"
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--models', nargs='+', default=['distilbert', 'custom'], choices=['distilbert', 'custom'])
+    parser.add_argument('--minutes', nargs='+', type=float, default=TRANSCRIPT_MINUTES, help='Transcript lengths')
+    parser.add_argument('--words', nargs='+', type=int, default=TEXT_WORDS, help='Text lengths')
+    parser.add_argument('--output', help='Write results as JSON lines to this file')
+    parser.add_argument('--baseline', help='Previous results to compare throughput against')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='Allowed relative throughput drop and memory growth increase')
+    parser.add_argument('--memory-slack-mib', type=float, default=16, help='Memory growth increase always allowed, to absorb noise on small cases')
+    args = parser.parse_args()
+
+    cases = [
+        {'kind': kind, 'size': size, 'model': model}
+        for model in args.models
+        for kind, sizes in (('transcript', args.minutes), ('text', args.words))
+        for size in sizes
+    ]
+
+    # A fresh spawned process per case, so peak memory is not carried over between cases
+    results = []
+    context = multiprocessing.get_context('spawn')
+    for case in cases:
+        with context.Pool(1) as pool:
+            result = pool.apply(run_case, (case,))
+        results.append(result)
+        print(
+            f'{case_name(result):<28} {result["seconds"]:8.2f}s  '
+            f'throughput={result["throughput"]:10.1f}/s  '
+            f'peak_rss={result["peak_rss_bytes"] / 2 ** 20:8.1f}MiB  '
+            f'rss_growth={result["rss_growth_bytes"] / 2 ** 20:8.1f}MiB'
+        )
+
+    if args.output:
+        with open(args.output, 'w') as file:
+            for result in results:
+                file.write(json.dumps(result) + '\n')
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            baseline = {case_name(r): r for r in map(json.loads, file)}
+
+        regressions = []
+        for r in results:
+            before = baseline.get(case_name(r))
+            if before is None:
+                continue
+            if r['throughput'] < before['throughput'] * (1 - args.tolerance):
+                regressions.append(f'{case_name(r)}: throughput {before["throughput"]:.1f}/s -> {r["throughput"]:.1f}/s')
+            # Older baselines have no memory growth to compare against
+            if 'rss_growth_bytes' in before:
+                allowed = before['rss_growth_bytes'] * (1 + args.tolerance) + args.memory_slack_mib * 2 ** 20
+                if r['rss_growth_bytes'] > allowed:
+                    regressions.append(
+                        f'{case_name(r)}: rss growth {before["rss_growth_bytes"] / 2 ** 20:.1f}MiB'
+                        f' -> {r["rss_growth_bytes"] / 2 ** 20:.1f}MiB'
+                    )
+        for regression in regressions:
+            print(f'REGRESSION {regression}')
+        if regressions:
+            sys.exit(1)
+
+if __name__ == '__main__':
+    main()
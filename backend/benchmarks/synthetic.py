@@ -0,0 +1,55 @@
+"""
+Synthetic inputs for the benchmark scripts.
+
+Generates deterministic YouTube-style transcripts and plain texts of a given size, so
+benchmark runs are reproducible and do not need network access.
+"""
+import random
+from typing import List
+
+# Small vocabulary mixing neutral, positive and negative words
+WORDS = (
+    'the a this that video really very quite honestly just so we you i it is was '
+    'good great amazing love awesome fantastic enjoyed helpful nice brilliant '
+    'bad terrible awful hate boring worst annoying broken disappointing poor '
+    'today then because when where what how thing people time way year day'
+).split()
+
+def make_text(word_count: int, seed: int = 0) -> str:
+    """
+    Builds a deterministic text with the given number of words.
+
+    Args:
+    - word_count (int): Number of words in the text.
+    - seed (int): Seed for the random generator.
+
+    Returns:
+    - str: Space separated text.
+    """
+    rng = random.Random(seed)
+    return ' '.join(rng.choice(WORDS) for _ in range(word_count))
+
+def make_transcript(minutes: float, seed: int = 0) -> List[dict]:
+    """
+    Builds a deterministic transcript shaped like `YouTubeTranscriptApi.get_transcript` output.
+
+    Args:
+    - minutes (float): Length of the video in minutes.
+    - seed (int): Seed for the random generator.
+
+    Returns:
+    - List[dict]: Caption segments with "text", "start" and "duration" fields.
+    """
+    rng = random.Random(seed)
+    transcript = []
+    start = 0.0
+    while start < minutes * 60:
+        duration = rng.uniform(2.0, 5.0)
+        words = rng.randint(6, 14)  # Roughly conversational speaking rate
+        transcript.append({
+            'text': ' '.join(rng.choice(WORDS) for _ in range(words)),
+            'start': round(start, 2),
+            'duration': round(duration, 2),
+        })
+        start += duration
+    return transcript
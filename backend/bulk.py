@@ -0,0 +1,267 @@
+"""
+Bulk offline analysis of many videos or texts.
+
+Reads a JSONL file where every line is one item:
+    {"id": "a", "text": "..."}
+    {"id": "b", "video_id": "dQw4w9WgXcQ"}
+    {"id": "c", "transcript_file": "transcripts/c.json"}
+
+Items are scored across a bounded pool of worker processes and each result is appended to
+an NDJSON file as soon as it is done. That file is also the checkpoint: running the same
+command again skips every item already in it. With --retry-errors, failed items are scored
+again and their new record is appended after the old one. With a `.parquet` output the
+checkpoint is kept next to it and converted to Parquet (requires pyarrow) once all items
+are done.
+
+Usage, from the `backend` directory:
+    python bulk.py items.jsonl results.ndjson --workers 8
+    python bulk.py items.jsonl results.parquet --custom --transcript-dir transcripts/
+"""
+import argparse
+import json
+import multiprocessing
+import os
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import Callable, Dict, List, Optional, Set
+
+import transcripts
+
+# Transcript fetcher of a worker process, set by `_init_worker`
+_fetcher = None
+
+def read_items(input_path: str) -> List[dict]:
+    """
+    Reads the items of a job. Items without an "id" are identified by their line number.
+
+    Args:
+    - input_path (str): Path of the JSONL input file.
+
+    Returns:
+    - List[dict]: The items, each with an "id".
+    """
+    items = []
+    with open(input_path, encoding='utf-8') as file:
+        for line_number, line in enumerate(file, start=1):
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            item['id'] = str(item.get('id', line_number))
+            items.append(item)
+    return items
+
+def load_finished(output_path: str, retry_errors: bool = False) -> Set[str]:
+    """
+    Reads the ids of the items already in a checkpoint file.
+
+    A line left half written by an interrupted run is cut off, so new results are appended
+    after the last complete line.
+
+    Args:
+    - output_path (str): Path of the NDJSON checkpoint.
+    - retry_errors (bool): Leave failed items out, so they are scored again.
+
+    Returns:
+    - Set[str]: Ids of the finished items.
+    """
+    finished = set()
+    if not os.path.exists(output_path):
+        return finished
+
+    valid_bytes = 0
+    with open(output_path, 'rb') as file:
+        for line in file:
+            if not line.endswith(b'\n'):
+                break
+            valid_bytes += len(line)
+            record = json.loads(line)
+            if not (retry_errors and 'error' in record):
+                finished.add(record['id'])
+
+    if valid_bytes != os.path.getsize(output_path):
+        with open(output_path, 'r+b') as file:
+            file.truncate(valid_bytes)
+    return finished
+
+def _init_worker(transcript_dir: Optional[str], torch_threads: int):
+    global _fetcher
+    from model_registry import configure_torch_threads
+
+    # One or a few torch threads per process, so the pool uses every core without oversubscribing.
+    # The variable also sizes the ONNX Runtime session, which the worker creates on first use
+    os.environ['SENTIMENT_TORCH_THREADS'] = str(torch_threads)
+    configure_torch_threads(intra_op=torch_threads, inter_op=1)
+    _fetcher = transcripts.LocalTranscriptFetcher(transcript_dir) if transcript_dir else transcripts.get_fetcher()
+
+def score_item(item: dict, use_custom_model: bool) -> dict:
+    """
+    Scores one item with the same segmentation the API endpoints use.
+
+    Args:
+    - item (dict): An item with "text", "video_id" or "transcript_file".
+    - use_custom_model (bool): Whether to use the custom trained model.
+
+    Returns:
+    - dict: {"id", "kind", "result"} on success, {"id", "kind", "error"} on failure.
+    """
+    import model_util
+
+    kind = next((key for key in ('text', 'video_id', 'transcript_file') if key in item), None)
+    try:
+        if kind == 'text':
+            result = model_util.get_segmented_sentiment_wordcount(
+                text=item['text'],
+                max_word_count=model_util.get_max_word_count(item['text']),
+                use_custom_model=use_custom_model,
+            )
+        elif kind is not None:
+            if kind == 'video_id':
+                transcript = _fetcher.fetch(item['video_id'])
+            else:
+                with open(item['transcript_file'], encoding='utf-8') as file:
+                    transcript = json.load(file)
+            result = model_util.get_segmented_sentiment_youtubecaption(
+                data=transcript,
+                second=model_util.get_second_split(transcript),
+                use_custom_model=use_custom_model,
+            )
+        else:
+            raise ValueError('Item needs one of "text", "video_id" or "transcript_file"')
+    except Exception as e:
+        return {'id': item['id'], 'kind': kind, 'error': f'{type(e).__name__}: {e}'}
+
+    return {'id': item['id'], 'kind': kind, 'result': result}
+
+def parquet_available() -> bool:
+    """
+    Returns whether pyarrow, needed for Parquet output, can be imported.
+    """
+    try:
+        import pyarrow.parquet
+    except ImportError:
+        return False
+    return True
+
+def write_parquet(checkpoint_path: str, output_path: str):
+    """
+    Converts an NDJSON checkpoint into a Parquet file.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    # A retried item appears more than once; its latest record wins
+    records = {}
+    with open(checkpoint_path, encoding='utf-8') as file:
+        for line in file:
+            record = json.loads(line)
+            records[record['id']] = record
+    records = list(records.values())
+    schema = pa.schema([
+        ('id', pa.string()),
+        ('kind', pa.string()),
+        ('result', pa.list_(pa.list_(pa.float64()))),
+        ('error', pa.string()),
+    ])
+    pq.write_table(pa.Table.from_pylist(records, schema=schema), output_path)
+
+def checkpoint_path_for(output_path: str) -> str:
+    """
+    Returns the NDJSON file results are appended to for a given output path.
+    """
+    return output_path + '.checkpoint.ndjson' if output_path.endswith('.parquet') else output_path
+
+def run(
+    input_path: str,
+    output_path: str,
+    use_custom_model: bool = False,
+    workers: Optional[int] = None,
+    transcript_dir: Optional[str] = None,
+    retry_errors: bool = False,
+    progress: Optional[Callable[[int, int], None]] = None,
+) -> Dict[str, int]:
+    """
+    Scores every unfinished item of a job, resuming from the checkpoint if there is one.
+
+    Args:
+    - input_path (str): JSONL file of items.
+    - output_path (str): `.ndjson` or `.parquet` output file.
+    - use_custom_model (bool): Whether to use the custom trained model.
+    - workers (int): Number of worker processes. Defaults to one per core.
+    - transcript_dir (str): Read `<video_id>.json` transcripts from this directory instead of YouTube.
+    - retry_errors (bool): Score items that failed in a previous run again.
+    - progress (Callable[[int, int], None]): Called with (finished, total) after every item.
+
+    Returns:
+    - Dict[str, int]: Number of items in total, skipped from the checkpoint, scored and failed.
+    """
+    checkpoint_path = checkpoint_path_for(output_path)
+    # Fail before scoring anything rather than after the last item
+    if output_path != checkpoint_path and not parquet_available():
+        raise RuntimeError('Parquet output requires pyarrow (pip install pyarrow)')
+
+    workers = workers or os.cpu_count() or 1
+    torch_threads = max(1, (os.cpu_count() or 1) // workers)
+
+    items = read_items(input_path)
+    finished = load_finished(checkpoint_path, retry_errors=retry_errors)
+    pending = [item for item in items if item['id'] not in finished]
+    summary = {'total': len(items), 'skipped': len(items) - len(pending), 'scored': 0, 'failed': 0}
+
+    # Spawned workers, since the job API runs this from a thread of a multi-threaded server
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context('spawn'),
+        initializer=_init_worker,
+        initargs=(transcript_dir, torch_threads),
+    ) as pool, open(checkpoint_path, 'a', encoding='utf-8') as out:
+        # Keep only a bounded number of items in flight so huge jobs do not queue everything at once
+        queue = iter(pending)
+        in_flight = set()
+        while True:
+            for item in queue:
+                in_flight.add(pool.submit(score_item, item, use_custom_model))
+                if len(in_flight) >= workers * 2:
+                    break
+            if not in_flight:
+                break
+
+            done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                record = future.result()
+                out.write(json.dumps(record) + '\n')
+                summary['failed' if 'error' in record else 'scored'] += 1
+            # Flush after every batch of results, so a restart loses as little work as possible
+            out.flush()
+
+            if progress:
+                progress(summary['skipped'] + summary['scored'] + summary['failed'], summary['total'])
+
+    if output_path != checkpoint_path:
+        write_parquet(checkpoint_path, output_path)
+    return summary
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('input', help='JSONL file of items')
+    parser.add_argument('output', help='Output file, .ndjson or .parquet')
+    parser.add_argument('--custom', action='store_true', help='Use the custom SVR model instead of DistilBERT')
+    parser.add_argument('--workers', type=int, help='Worker processes (default: one per core)')
+    parser.add_argument('--transcript-dir', help='Read <video_id>.json transcripts from this directory instead of YouTube')
+    parser.add_argument('--retry-errors', action='store_true', help='Score items that failed in a previous run again')
+    args = parser.parse_args()
+
+    def progress(finished, total):
+        print(f'\r{finished}/{total} items', end='', flush=True)
+
+    summary = run(
+        input_path=args.input,
+        output_path=args.output,
+        use_custom_model=args.custom,
+        workers=args.workers,
+        transcript_dir=args.transcript_dir,
+        retry_errors=args.retry_errors,
+        progress=progress,
+    )
+    print(f'\n{summary}')
+
+if __name__ == '__main__':
+    main()
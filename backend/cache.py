@@ -0,0 +1,229 @@
+"""
+Two-level cache for transcripts and analysis results.
+
+- Level 1: an in-process LRU cache bounded by the total size of its entries.
+- Level 2: an SQLite file shared by every gunicorn worker on the machine.
+
+Values must be JSON serializable. Both levels honour a per-cache TTL.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import metrics
+
+# Location of the shared on-disk cache
+CACHE_PATH = os.environ.get(
+    'SENTIMENT_CACHE_PATH',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cache.sqlite3'),
+)
+
+# Size budget of each in-process cache, in bytes of serialized JSON
+MEMORY_CACHE_BYTES = int(os.environ.get('SENTIMENT_MEMORY_CACHE_BYTES', 64 * 1024 * 1024))
+
+# Time to live of cached entries, in seconds
+TRANSCRIPT_TTL = int(os.environ.get('SENTIMENT_TRANSCRIPT_TTL', 24 * 60 * 60))
+RESULT_TTL = int(os.environ.get('SENTIMENT_RESULT_TTL', 7 * 24 * 60 * 60))
+
+# Expired rows are deleted from the shared file after every PURGE_EVERY writes of a process
+PURGE_EVERY = int(os.environ.get('SENTIMENT_CACHE_PURGE_EVERY', 500))
+
+class LRUCache:
+    """
+    Thread-safe in-memory LRU cache that evicts by total entry size.
+    """
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self._entries = OrderedDict()  # key -> (value, size, expires_at)
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, size, expires_at = entry
+            if expires_at < time.time():
+                del self._entries[key]
+                self.current_bytes -= size
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any, size: int, ttl: float):
+        with self._lock:
+            # Drop the old value first, so it is not served after a too large new one is skipped
+            if key in self._entries:
+                self.current_bytes -= self._entries.pop(key)[1]
+
+            # Entries larger than the whole budget are never kept
+            if size > self.max_bytes:
+                return
+            self._entries[key] = (value, size, time.time() + ttl)
+            self.current_bytes += size
+
+            # Evict least recently used entries until the cache fits its budget
+            while self.current_bytes > self.max_bytes:
+                _, (_, evicted_size, _) = self._entries.popitem(last=False)
+                self.current_bytes -= evicted_size
+
+    def __len__(self):
+        return len(self._entries)
+
+class DiskCache:
+    """
+    SQLite backed cache shared across processes.
+
+    Each thread of each process opens its own connection, so the cache is safe to use
+    from Flask request threads and from forked gunicorn workers.
+    """
+    def __init__(self, path: str, purge_every: int = PURGE_EVERY):
+        self.path = path
+        self.purge_every = purge_every
+        self._writes = 0
+        self._writes_lock = threading.Lock()
+        self._local = threading.local()
+
+    def _connection(self) -> sqlite3.Connection:
+        # Connections must not be shared with a forked child, so key them by process id
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS cache ('
+                'namespace TEXT, key TEXT, value TEXT, expires_at REAL, '
+                'PRIMARY KEY (namespace, key))'
+            )
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def get(self, namespace: str, key: str) -> Optional[Tuple[str, float]]:
+        """
+        Returns the stored value and its expiry time, or None if it is missing or expired.
+        """
+        conn = self._connection()
+        row = conn.execute(
+            'SELECT value, expires_at FROM cache WHERE namespace = ? AND key = ?',
+            (namespace, key),
+        ).fetchone()
+        if row is None:
+            return None
+        if row[1] < time.time():
+            with conn:
+                conn.execute('DELETE FROM cache WHERE namespace = ? AND key = ?', (namespace, key))
+            return None
+        return row[0], row[1]
+
+    def set(self, namespace: str, key: str, value: str, ttl: float):
+        conn = self._connection()
+        with conn:
+            conn.execute(
+                'INSERT OR REPLACE INTO cache (namespace, key, value, expires_at) VALUES (?, ?, ?, ?)',
+                (namespace, key, value, time.time() + ttl),
+            )
+
+        # Expired rows are otherwise only deleted when the same key is read again
+        with self._writes_lock:
+            self._writes += 1
+            purge = self._writes % self.purge_every == 0
+        if purge:
+            self.purge_expired()
+
+    def purge_expired(self):
+        """
+        Deletes every expired row, so the shared file does not grow without bound.
+        """
+        conn = self._connection()
+        with conn:
+            conn.execute('DELETE FROM cache WHERE expires_at < ?', (time.time(),))
+
+class TwoLevelCache:
+    """
+    Looks values up in memory first, then on disk, and counts hits and misses per level.
+    """
+    def __init__(self, namespace: str, disk: DiskCache, ttl: float, max_bytes: int = MEMORY_CACHE_BYTES):
+        self.namespace = namespace
+        self.disk = disk
+        self.ttl = ttl
+        self.memory = LRUCache(max_bytes)
+        self.stats = {'memory_hits': 0, 'disk_hits': 0, 'misses': 0}
+        self._stats_lock = threading.Lock()
+
+    def _count(self, name: str):
+        with self._stats_lock:
+            self.stats[name] += 1
+        # The stats above are per process; the /metrics counter adds up all workers
+        metrics.cache_events.inc(self.namespace, name)
+
+    def get(self, key: str) -> Optional[Any]:
+        value = self.memory.get(key)
+        if value is not None:
+            self._count('memory_hits')
+            return value
+
+        row = self.disk.get(self.namespace, key)
+        if row is not None:
+            self._count('disk_hits')
+            raw, expires_at = row
+            value = json.loads(raw)
+            # Keep it in memory only for the rest of its lifetime on disk
+            self.memory.set(key, value, size=len(raw), ttl=expires_at - time.time())
+            return value
+
+        self._count('misses')
+        return None
+
+    def set(self, key: str, value: Any):
+        raw = json.dumps(value)
+        self.memory.set(key, value, size=len(raw), ttl=self.ttl)
+        self.disk.set(self.namespace, key, raw, ttl=self.ttl)
+
+    def get_or_set(self, key: str, compute: Callable[[], Any]) -> Any:
+        """
+        Returns the cached value for `key`, computing and storing it on a miss.
+
+        Args:
+        - key (str): Cache key.
+        - compute (Callable[[], Any]): Produces the value when it is not cached.
+
+        Returns:
+        - Any: The cached or freshly computed value.
+        """
+        value = self.get(key)
+        if value is None:
+            value = compute()
+            self.set(key, value)
+        return value
+
+    def get_stats(self) -> Dict[str, int]:
+        with self._stats_lock:
+            return {**self.stats, 'memory_entries': len(self.memory), 'memory_bytes': self.memory.current_bytes}
+
+# Shared caches used by the app
+disk_cache = DiskCache(CACHE_PATH)
+transcript_cache = TwoLevelCache('transcript', disk_cache, ttl=TRANSCRIPT_TTL)
+result_cache = TwoLevelCache('result', disk_cache, ttl=RESULT_TTL)
+
+def result_key(video_id: str, model: str, model_version: str) -> str:
+    """
+    Builds the cache key of a finished YouTube analysis.
+
+    The segment length is derived from the transcript, so the video ID determines it.
+
+    Args:
+    - video_id (str): The YouTube video ID.
+    - model (str): Name of the model used.
+    - model_version (str): Version of the model and its windowing settings.
+
+    Returns:
+    - str: The cache key.
+    """
+    return f'{video_id}|{model}|{model_version}'
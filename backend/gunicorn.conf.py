@@ -0,0 +1,49 @@
+"""
+Gunicorn settings for the backend, picked up automatically when gunicorn runs from this directory:
+    gunicorn app:app
+
+Models are loaded once in the master and shared copy-on-write with the forked workers.
+Set SENTIMENT_PRELOAD=0 to load them lazily in each worker instead. ONNX Runtime sessions
+are not fork-safe, so with an ONNX backend DistilBERT is always loaded in each worker.
+Each worker gets cpu_count // workers inference threads unless SENTIMENT_TORCH_THREADS is set.
+"""
+import gc
+import os
+
+workers = int(os.environ.get('WEB_CONCURRENCY', 2))
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+timeout = 120
+
+# Import the app (and the model registry) in the master before forking
+preload_app = os.environ.get('SENTIMENT_PRELOAD', '1') == '1'
+
+def when_ready(server):
+    # Start the shared metrics from zero, like a restarted single process would
+    import metrics
+    metrics.shared_store.reset()
+
+    if not preload_app:
+        return
+
+    from model_registry import DISTILBERT_BACKEND, registry
+
+    # An ONNX Runtime session created here would be shared by the forked workers, with a
+    # thread pool sized for the master; leave it for each worker to create on first use
+    names = [name for name in registry.stats() if name != 'distilbert' or DISTILBERT_BACKEND == 'torch']
+    registry.preload(names)
+    for name, stats in registry.stats().items():
+        server.log.info(f'Preloaded {name}: {stats}')
+
+    # Move everything loaded so far out of the garbage collector's reach; otherwise the GC
+    # touching object headers would copy the shared pages into every worker
+    gc.freeze()
+
+def post_fork(server, worker):
+    from model_registry import configure_torch_threads
+
+    # Split the cores between the workers, like `bulk.run` does for its pool, unless
+    # SENTIMENT_TORCH_THREADS says otherwise. The ONNX Runtime session, created later in
+    # the worker, reads the same variable
+    intra_op = int(os.environ.get('SENTIMENT_TORCH_THREADS', 0)) or max(1, (os.cpu_count() or 1) // server.cfg.workers)
+    os.environ['SENTIMENT_TORCH_THREADS'] = str(intra_op)
+    configure_torch_threads(intra_op=intra_op, inter_op=int(os.environ.get('SENTIMENT_TORCH_INTEROP_THREADS', 0)) or 1)
@@ -0,0 +1,170 @@
+"""
+Cross-request dynamic micro-batching for model inference.
+
+Request threads submit their windows to a `MicroBatchScheduler` and wait on a future.
+A single worker thread drains the queue, groups items from concurrent requests into
+micro-batches of up to `max_batch_size` (waiting at most `max_wait_ms` for a batch to
+fill up) and runs the model once per micro-batch.
+"""
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from typing import Any, Callable, List, Optional
+
+class QueueFullError(Exception):
+    """
+    Raised when the scheduler queue stays full for longer than the submit timeout.
+    """
+
+class _Request:
+    """
+    Bookkeeping for the items of one `submit` call.
+    """
+    def __init__(self, items: list):
+        self.future = Future()
+        self.results = [None] * len(items)
+        self.remaining = len(items)
+
+class MicroBatchScheduler:
+    """
+    Groups inference work from concurrent requests into micro-batches.
+
+    Args:
+    - predict_fn (Callable[[list], list]): Runs the model on a list of items and returns one output per item.
+    - max_batch_size (int): Maximum number of items per model call.
+    - max_wait_ms (float): Maximum time to wait for a micro-batch to fill up once an item is queued.
+    - max_queue_size (int): Maximum number of queued items; `submit` blocks while the queue is full and then fails.
+    - submit_timeout (float): Seconds `submit` waits for queue space before raising `QueueFullError`.
+    """
+    def __init__(
+        self,
+        predict_fn: Callable[[list], list],
+        max_batch_size: int = 32,
+        max_wait_ms: float = 5,
+        max_queue_size: int = 4096,
+        submit_timeout: float = 1.0,
+    ):
+        self.predict_fn = predict_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.max_queue_size = max_queue_size
+        self.submit_timeout = submit_timeout
+
+        self._queue = deque()  # (request, item index, item)
+        self._cond = threading.Condition()
+        self._stopped = False
+        self._worker = threading.Thread(target=self._run, name='inference-scheduler', daemon=True)
+        self._worker.start()
+
+    def submit(self, items: List[Any]) -> Future:
+        """
+        Queues items for inference.
+
+        Args:
+        - items (List[Any]): Items to run through the model.
+
+        Returns:
+        - Future: Resolves to the list of outputs, in the order of `items`.
+
+        Raises:
+        - QueueFullError: If the queue has no room for the items within `submit_timeout`.
+        """
+        request = _Request(items)
+        if not items:
+            request.future.set_result([])
+            return request.future
+
+        # Apply backpressure. A request is admitted in chunks as space frees up, so one bigger
+        # than the free space (or than the whole queue) is not starved by a stream of small ones
+        position = 0
+        deadline = time.monotonic() + self.submit_timeout
+        with self._cond:
+            while position < len(items):
+                free = self.max_queue_size - len(self._queue)
+                if free <= 0:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        error = QueueFullError(f'Inference queue is full ({len(self._queue)} items waiting)')
+                        # Fail the future, so the worker drops any items it already took, and take
+                        # back the items still queued, so they do not hold on to the space
+                        request.future.set_exception(error)
+                        self._queue = deque(entry for entry in self._queue if entry[0] is not request)
+                        self._cond.notify_all()
+                        raise error
+                    self._cond.wait(remaining)
+                    continue
+
+                chunk = items[position:position + free]
+                self._queue.extend((request, position + i, item) for i, item in enumerate(chunk))
+                position += len(chunk)
+                # The timeout only applies while no progress is made
+                deadline = time.monotonic() + self.submit_timeout
+                self._cond.notify_all()
+
+        return request.future
+
+    def queue_size(self) -> int:
+        """
+        Returns the number of items waiting for inference.
+        """
+        return len(self._queue)
+
+    def stop(self):
+        """
+        Stops the worker thread after the queued items are processed.
+        """
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+        self._worker.join()
+
+    def _next_batch(self) -> Optional[list]:
+        with self._cond:
+            while not self._queue:
+                if self._stopped:
+                    return None
+                self._cond.wait()
+
+            # Give concurrent requests a short window to add to the batch
+            deadline = time.monotonic() + self.max_wait
+            while len(self._queue) < self.max_batch_size and not self._stopped:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+
+            # Skip the remaining items of requests that already failed
+            batch = []
+            while self._queue and len(batch) < self.max_batch_size:
+                entry = self._queue.popleft()
+                if not entry[0].future.done():
+                    batch.append(entry)
+
+            # Wake up submitters waiting for queue space
+            self._cond.notify_all()
+            return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                return
+            if not batch:
+                continue  # Every item taken belonged to a failed request
+
+            try:
+                outputs = self.predict_fn([item for _, _, item in batch])
+            except Exception as e:
+                for request, _, _ in batch:
+                    if not request.future.done():
+                        request.future.set_exception(e)
+                continue
+
+            for (request, i, _), output in zip(batch, outputs):
+                if request.future.done():
+                    continue  # Another batch of this request already failed
+                request.results[i] = output
+                request.remaining -= 1
+                if request.remaining == 0:
+                    request.future.set_result(request.results)
@@ -0,0 +1,231 @@
+"""
+Batch jobs submitted through the API and run with `bulk.run`.
+
+Each job lives in its own directory under JOBS_DIR with its input items, a status file and
+the results checkpoint, so any worker can report on it and an interrupted job can be
+resumed without redoing finished items.
+
+A job holds an exclusive lock on its directory while it runs, and every process that
+queues jobs holds a lock on its own owner file for as long as it lives. The OS drops the
+locks when the process dies, so a job can never run twice at once, and a running or
+queued job whose worker died shows up as 'interrupted' and can be resumed.
+
+Each server process runs its jobs one at a time, so under gunicorn up to WEB_CONCURRENCY
+jobs run at once. Each job's pool has one process per core unless SENTIMENT_JOB_WORKERS
+is set.
+"""
+import json
+import os
+import re
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import suppress
+from typing import IO, List, Optional
+
+import bulk
+
+try:
+    import fcntl
+    msvcrt = None
+except ImportError:
+    # Windows has no flock; lock the first byte of the file instead
+    fcntl = None
+    import msvcrt
+
+JOBS_DIR = os.environ.get(
+    'SENTIMENT_JOBS_DIR',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'jobs'),
+)
+
+# Number of worker processes per job; defaults to one per core
+JOB_WORKERS = int(os.environ.get('SENTIMENT_JOB_WORKERS', 0)) or None
+
+_runner = ThreadPoolExecutor(max_workers=1, thread_name_prefix='bulk-job')
+
+def job_dir(job_id: str) -> Optional[str]:
+    """
+    Returns the directory of a job, or None if the id is malformed or unknown.
+    """
+    if not re.fullmatch(r'[0-9a-f]{32}', job_id):
+        return None
+    path = os.path.join(JOBS_DIR, job_id)
+    return path if os.path.isdir(path) else None
+
+def output_path(path: str, status: dict) -> str:
+    return os.path.join(path, f'results.{status["format"]}')
+
+def checkpoint_path(path: str, status: dict) -> str:
+    return bulk.checkpoint_path_for(output_path(path, status))
+
+def read_status(path: str) -> dict:
+    with open(os.path.join(path, 'status.json'), encoding='utf-8') as file:
+        return json.load(file)
+
+def write_status(path: str, **fields):
+    status = read_status(path) if os.path.exists(os.path.join(path, 'status.json')) else {}
+    status.update(fields)
+
+    # Write then rename, so readers never see a half written status file
+    tmp_path = os.path.join(path, f'status.json.{os.getpid()}.{threading.get_ident()}.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as file:
+        json.dump(status, file)
+    os.replace(tmp_path, os.path.join(path, 'status.json'))
+
+def _try_lock(lock_path: str, wait: float = 0) -> Optional[IO]:
+    """
+    Takes an exclusive lock on a file. The OS releases it if the process dies.
+
+    Args:
+    - lock_path (str): The lock file, created if missing.
+    - wait (float): Seconds to keep retrying while another holder has the lock.
+
+    Returns:
+    - The open lock file, to pass to `_release`, or None if the lock is held elsewhere.
+    """
+    deadline = time.monotonic() + wait
+    file = open(lock_path, 'a+')
+    while True:
+        try:
+            if fcntl is not None:
+                fcntl.flock(file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            else:
+                file.seek(0)
+                msvcrt.locking(file.fileno(), msvcrt.LK_NBLCK, 1)
+            return file
+        except OSError:
+            if time.monotonic() >= deadline:
+                file.close()
+                return None
+            time.sleep(0.05)
+
+def _release(lock: IO):
+    if msvcrt is not None:
+        lock.seek(0)
+        msvcrt.locking(lock.fileno(), msvcrt.LK_UNLCK, 1)
+    lock.close()
+
+def _is_locked(lock_path: str) -> bool:
+    lock = _try_lock(lock_path)
+    if lock is None:
+        return True
+    _release(lock)
+    return False
+
+# Owner id and lock of this process, created by the first job it queues
+_owner = None  # (pid, owner id, lock file)
+_owner_guard = threading.Lock()
+
+def _owner_path(owner_id: str) -> str:
+    return os.path.join(JOBS_DIR, 'owners', f'{owner_id}.lock')
+
+def _owner_id() -> str:
+    """
+    Returns the owner id of this process, taking its owner lock on first use.
+    """
+    global _owner
+    with _owner_guard:
+        # A forked worker must not reuse its parent's id
+        if _owner is None or _owner[0] != os.getpid():
+            owner_id = uuid.uuid4().hex
+            os.makedirs(os.path.dirname(_owner_path(owner_id)), exist_ok=True)
+            _owner = (os.getpid(), owner_id, _try_lock(_owner_path(owner_id)))
+        return _owner[1]
+
+def _owner_alive(owner_id: Optional[str]) -> bool:
+    """
+    Returns whether the process that queued a job is still running.
+    """
+    if not owner_id or not os.path.exists(_owner_path(owner_id)):
+        return False
+    if _is_locked(_owner_path(owner_id)):
+        return True
+    # The owner is gone for good; drop its file
+    with suppress(OSError):
+        os.remove(_owner_path(owner_id))
+    return False
+
+def is_running(path: str) -> bool:
+    """
+    Returns whether some process is running the job right now.
+    """
+    return _is_locked(os.path.join(path, 'run.lock'))
+
+def _run(path: str):
+    # Wait a little, since `is_running` briefly takes the lock to test it
+    lock = _try_lock(os.path.join(path, 'run.lock'), wait=1)
+    if lock is None:
+        return  # Already running, e.g. resumed twice
+
+    try:
+        status = read_status(path)
+        if status['state'] == 'done':
+            return
+        write_status(path, state='running', pid=os.getpid())
+        try:
+            summary = bulk.run(
+                input_path=os.path.join(path, 'input.jsonl'),
+                output_path=output_path(path, status),
+                use_custom_model=status['use_custom_model'],
+                workers=JOB_WORKERS,
+            )
+        except Exception as e:
+            write_status(path, state='failed', error=f'{type(e).__name__}: {e}')
+            return
+        write_status(path, state='done', summary=summary)
+    finally:
+        _release(lock)
+
+def submit(items: List[dict], use_custom_model: bool, output_format: str = 'ndjson') -> str:
+    """
+    Creates a job for the given items and queues it.
+
+    Args:
+    - items (List[dict]): Items with "text", "video_id" or "transcript_file", see `bulk`.
+    - use_custom_model (bool): Whether to use the custom trained model.
+    - output_format (str): 'ndjson' or 'parquet'.
+
+    Returns:
+    - str: The job id.
+    """
+    job_id = uuid.uuid4().hex
+    path = os.path.join(JOBS_DIR, job_id)
+    os.makedirs(path)
+
+    with open(os.path.join(path, 'input.jsonl'), 'w', encoding='utf-8') as file:
+        for item in items:
+            file.write(json.dumps(item) + '\n')
+
+    write_status(path, state='queued', owner=_owner_id(), total=len(items), use_custom_model=bool(use_custom_model), format=output_format)
+    _runner.submit(_run, path)
+    return job_id
+
+def resume(path: str):
+    """
+    Queues a job again, e.g. after a restart interrupted it. Finished items are skipped.
+
+    Callers should check `get_status` first; a job that is still queued or running is left alone.
+    """
+    write_status(path, state='queued', owner=_owner_id(), error=None)
+    _runner.submit(_run, path)
+
+def get_status(path: str) -> dict:
+    """
+    Returns the status of a job with the number of items finished so far.
+
+    The state comes from the locks when they disagree: a job left 'running' by a process
+    that died, or 'queued' in a process that died before starting it, is reported as
+    'interrupted'.
+    """
+    status = read_status(path)
+    if is_running(path):
+        status['state'] = 'running'
+    elif status['state'] == 'running' or (status['state'] == 'queued' and not _owner_alive(status.get('owner'))):
+        status['state'] = 'interrupted'
+    checkpoint = checkpoint_path(path, status)
+    finished = 0
+    if os.path.exists(checkpoint):
+        with open(checkpoint, 'rb') as file:
+            finished = sum(1 for line in file if line.endswith(b'\n'))
+    return {**status, 'finished': finished}
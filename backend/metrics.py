@@ -0,0 +1,309 @@
+"""
+Per-stage timing and request-size histograms and cache counters, exposed in the Prometheus
+text format.
+
+Stages: transcript_fetch, segmentation, tokenization, chunking, inference and aggregation.
+
+Every process records into its own in-memory metrics and a background thread copies them
+to an SQLite table (by default in the shared cache file) every few seconds. `render` adds
+up the copies of all processes, so under gunicorn any worker serves the totals of all of
+them, and the rows of workers that exited are kept so counters never go backwards.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Dict, Iterable, Iterator, List, Sequence, Tuple
+
+# File the metrics of all processes are shared through; the cache file unless set
+METRICS_PATH = os.environ.get(
+    'SENTIMENT_METRICS_PATH',
+    os.environ.get(
+        'SENTIMENT_CACHE_PATH',
+        os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cache.sqlite3'),
+    ),
+)
+
+# Seconds between copies of a process's metrics to the shared file
+FLUSH_SECONDS = float(os.environ.get('SENTIMENT_METRICS_FLUSH_SECONDS', 5))
+
+# Histogram buckets in seconds, for stage durations
+TIME_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+# Histogram buckets for request sizes (words, seconds of video, segments, windows)
+SIZE_BUCKETS = (10, 100, 1_000, 10_000, 100_000, 1_000_000)
+
+class Histogram:
+    """
+    Thread-safe Prometheus style histogram with one series per label value.
+    """
+    def __init__(self, name: str, help_text: str, label: str, buckets: Sequence[float]):
+        self.name = name
+        self.help_text = help_text
+        self.label = label
+        self.buckets = tuple(buckets)
+        self._series: Dict[str, List[float]] = {}  # label value -> bucket counts, then sum and count
+        self._lock = threading.Lock()
+
+    def observe(self, label_value: str, value: float):
+        with self._lock:
+            series = self._series.setdefault(label_value, [0] * (len(self.buckets) + 2))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+        shared_store.mark_dirty()
+
+    def snapshot(self) -> Dict[str, List[float]]:
+        with self._lock:
+            return {label_value: list(series) for label_value, series in self._series.items()}
+
+    def clear(self):
+        self._series = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def merge(snapshots: Iterable[Dict[str, List[float]]]) -> Dict[str, List[float]]:
+        merged = {}
+        for snapshot in snapshots:
+            for label_value, series in snapshot.items():
+                if label_value in merged:
+                    merged[label_value] = [a + b for a, b in zip(merged[label_value], series)]
+                else:
+                    merged[label_value] = list(series)
+        return merged
+
+    def render(self, series_by_label: Dict[str, List[float]] = None) -> List[str]:
+        """
+        Renders the given series, by default those of this process.
+        """
+        series_by_label = self.snapshot() if series_by_label is None else series_by_label
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} histogram']
+        for label_value, series in sorted(series_by_label.items()):
+            labels = f'{self.label}="{label_value}"'
+            for bound, count in zip(self.buckets, series):
+                lines.append(f'{self.name}_bucket{{{labels},le="{bound}"}} {count}')
+            lines.append(f'{self.name}_bucket{{{labels},le="+Inf"}} {series[-1]}')
+            lines.append(f'{self.name}_sum{{{labels}}} {series[-2]}')
+            lines.append(f'{self.name}_count{{{labels}}} {series[-1]}')
+        return lines
+
+class Counter:
+    """
+    Thread-safe Prometheus style counter with one series per combination of label values.
+    """
+    def __init__(self, name: str, help_text: str, labels: Sequence[str]):
+        self.name = name
+        self.help_text = help_text
+        self.labels = tuple(labels)
+        self._values: Dict[str, float] = {}  # JSON list of label values -> count
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values: str, amount: float = 1):
+        key = json.dumps(label_values)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+        shared_store.mark_dirty()
+
+    def snapshot(self) -> Dict[str, float]:
+        with self._lock:
+            return dict(self._values)
+
+    def clear(self):
+        self._values = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def merge(snapshots: Iterable[Dict[str, float]]) -> Dict[str, float]:
+        merged = {}
+        for snapshot in snapshots:
+            for key, value in snapshot.items():
+                merged[key] = merged.get(key, 0) + value
+        return merged
+
+    def render(self, values: Dict[str, float] = None) -> List[str]:
+        """
+        Renders the given values, by default those of this process.
+        """
+        values = self.snapshot() if values is None else values
+        return gauge_lines(self.name, self.help_text, [
+            (dict(zip(self.labels, json.loads(key))), value) for key, value in sorted(values.items())
+        ], metric_type='counter')
+
+class SharedStore:
+    """
+    Copies the metrics of this process to an SQLite table shared by all processes.
+
+    Each process writes one row per metric under a random process id, so a restarted
+    worker never overwrites the rows of the worker it replaces.
+    """
+    def __init__(self, path: str, flush_seconds: float = FLUSH_SECONDS):
+        self.path = path
+        self.flush_seconds = flush_seconds
+        self.metrics = []  # Metrics with snapshot/merge/render, registered below
+        self._dirty = threading.Event()
+        self._lock = threading.Lock()
+        self._pid = None
+        self._process_id = None
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._after_fork)
+
+    def _after_fork(self):
+        # What the parent recorded is already counted in its own rows
+        for metric in self.metrics:
+            metric.clear()
+        self._dirty = threading.Event()
+        self._lock = threading.Lock()
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=10)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute(
+            'CREATE TABLE IF NOT EXISTS metrics ('
+            'process TEXT, name TEXT, data TEXT, PRIMARY KEY (process, name))'
+        )
+        return conn
+
+    def mark_dirty(self):
+        self._dirty.set()
+        # Start the flusher of this process; a forked worker does not inherit its parent's
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._pid = os.getpid()
+                    self._process_id = uuid.uuid4().hex
+                    threading.Thread(target=self._flush_loop, name='metrics-flush', daemon=True).start()
+
+    def _flush_loop(self):
+        pid = os.getpid()
+        while self._pid == pid:
+            time.sleep(self.flush_seconds)
+            try:
+                self.flush()
+            except sqlite3.Error:
+                pass  # Try again at the next interval
+
+    def flush(self):
+        """
+        Writes the metrics of this process to the shared table, if anything changed.
+        """
+        if self._pid != os.getpid() or not self._dirty.is_set():
+            return
+        self._dirty.clear()
+        rows = [(self._process_id, metric.name, json.dumps(metric.snapshot())) for metric in self.metrics]
+        conn = self._connection()
+        try:
+            with conn:
+                conn.executemany('INSERT OR REPLACE INTO metrics (process, name, data) VALUES (?, ?, ?)', rows)
+        finally:
+            conn.close()
+
+    def collect(self) -> Dict[str, list]:
+        """
+        Returns the snapshots of every process, by metric name.
+        """
+        conn = self._connection()
+        try:
+            rows = conn.execute('SELECT name, data FROM metrics').fetchall()
+        finally:
+            conn.close()
+        snapshots = {}
+        for name, data in rows:
+            snapshots.setdefault(name, []).append(json.loads(data))
+        return snapshots
+
+    def reset(self):
+        """
+        Deletes the rows of all processes, e.g. when the server starts.
+        """
+        conn = self._connection()
+        try:
+            with conn:
+                conn.execute('DELETE FROM metrics')
+        finally:
+            conn.close()
+
+shared_store = SharedStore(METRICS_PATH)
+
+stage_seconds = Histogram(
+    'sentiment_stage_seconds', 'Time spent in each processing stage.', 'stage', TIME_BUCKETS,
+)
+request_size = Histogram(
+    'sentiment_request_size', 'Size of analyzed inputs (words, video seconds, segments, windows).', 'unit', SIZE_BUCKETS,
+)
+cache_events = Counter('sentiment_cache_events_total', 'Cache lookups by outcome.', ('cache', 'event'))
+shared_store.metrics = [stage_seconds, request_size, cache_events]
+
+@contextmanager
+def timed(stage: str):
+    """
+    Records the duration of the enclosed block under `stage`.
+    """
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        stage_seconds.observe(stage, time.perf_counter() - t0)
+
+def timed_iter(iterable: Iterable, stage: str) -> Iterator:
+    """
+    Yields from `iterable` and records the total time spent producing its items under `stage`.
+
+    Used for lazy stages such as streaming segmentation, where the work happens between
+    the consumer's calls. The total is recorded once, when the iteration ends or is
+    abandoned, so it is comparable with the same stage timed with `timed`.
+    """
+    iterator = iter(iterable)
+    total = 0.0
+    try:
+        while True:
+            t0 = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                total += time.perf_counter() - t0
+                return
+            total += time.perf_counter() - t0
+            yield item
+    finally:
+        stage_seconds.observe(stage, total)
+
+def gauge_lines(name: str, help_text: str, samples: Iterable[Tuple[Dict[str, str], float]], metric_type: str = 'gauge') -> List[str]:
+    """
+    Renders a gauge or counter from (labels, value) samples.
+    """
+    lines = [f'# HELP {name} {help_text}', f'# TYPE {name} {metric_type}']
+    for labels, value in samples:
+        if value is None:
+            continue
+        label_text = ','.join(f'{key}="{val}"' for key, val in labels.items())
+        lines.append(f'{name}{{{label_text}}} {value}')
+    return lines
+
+def render(extra_lines: Iterable[str] = ()) -> str:
+    """
+    Renders the metrics of all processes in the Prometheus text exposition format.
+
+    Falls back to the metrics of this process if the shared file cannot be used.
+
+    Args:
+    - extra_lines (Iterable[str]): Additional already rendered lines, e.g. gauges of this worker.
+
+    Returns:
+    - str: The metrics page.
+    """
+    try:
+        shared_store.flush()
+        snapshots = shared_store.collect()
+        lines = [
+            line
+            for metric in shared_store.metrics
+            for line in metric.render(metric.merge(snapshots.get(metric.name, [])))
+        ]
+    except sqlite3.Error:
+        lines = [line for metric in shared_store.metrics for line in metric.render()]
+    return '\n'.join(lines + list(extra_lines)) + '\n'
@@ -0,0 +1,173 @@
+"""
+Lazy registry of the sentiment models.
+
+Models are loaded on first use, or eagerly with `registry.preload()`. Under gunicorn,
+`gunicorn.conf.py` preloads them in the master process and freezes the garbage collector
+before forking, so every worker shares the weights copy-on-write instead of loading its
+own copy. Load time and resident memory growth are recorded per model.
+"""
+import functools
+import hashlib
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+# Hugging Face model used by the DistilBERT option
+DISTILBERT_MODEL = 'distilbert/distilbert-base-uncased-finetuned-sst-2-english'
+
+# Inference backend of the DistilBERT option:
+# - 'torch': the transformers pipeline in eager PyTorch (default)
+# - 'onnx': ONNX Runtime, fp32
+# - 'onnx-int8': ONNX Runtime with the dynamically quantized int8 model
+DISTILBERT_BACKEND = os.environ.get('SENTIMENT_BACKEND', 'torch')
+if DISTILBERT_BACKEND not in ('torch', 'onnx', 'onnx-int8'):
+    raise ValueError(f'Unknown SENTIMENT_BACKEND: {DISTILBERT_BACKEND}')
+
+# Path of the custom trained Support Vector Regressor, resolved relative to this file
+# rather than the working directory
+CUSTOM_MODEL_PATH = os.environ.get(
+    'SENTIMENT_CUSTOM_MODEL_PATH',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'ml_model', 'svr_pipeline.pkl'),
+)
+
+def current_rss() -> Optional[int]:
+    """
+    Returns the resident set size of this process in bytes, or None if it cannot be measured.
+    """
+    try:
+        with open('/proc/self/statm') as file:
+            return int(file.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss
+    except ImportError:
+        return None
+
+def configure_torch_threads(intra_op: Optional[int] = None, inter_op: Optional[int] = None):
+    """
+    Sets the torch thread pools of this process.
+
+    Meant to be called once per worker right after fork, before any inference runs.
+    Values default to the SENTIMENT_TORCH_THREADS and SENTIMENT_TORCH_INTEROP_THREADS
+    environment variables; unset values leave torch's defaults untouched.
+
+    Args:
+    - intra_op (int): Threads used inside a single operator.
+    - inter_op (int): Threads used to run independent operators in parallel.
+    """
+    import torch
+
+    intra_op = intra_op or int(os.environ.get('SENTIMENT_TORCH_THREADS', 0))
+    inter_op = inter_op or int(os.environ.get('SENTIMENT_TORCH_INTEROP_THREADS', 0))
+
+    if intra_op:
+        torch.set_num_threads(intra_op)
+    if inter_op:
+        try:
+            torch.set_num_interop_threads(inter_op)
+        except RuntimeError:
+            # Torch only allows this before inter-op parallel work has started
+            pass
+
+class ModelRegistry:
+    """
+    Loads models on first use and keeps one instance per process.
+    """
+    def __init__(self):
+        self._loaders: Dict[str, Callable[[], Any]] = {}
+        self._models: Dict[str, Any] = {}
+        self._stats: Dict[str, Dict[str, float]] = {}
+        self._lock = threading.Lock()
+
+    def register(self, name: str, loader: Callable[[], Any]):
+        """
+        Registers a model loader under a name.
+        """
+        self._loaders[name] = loader
+
+    def get(self, name: str) -> Any:
+        """
+        Returns the model registered under `name`, loading it on first use.
+        """
+        model = self._models.get(name)
+        if model is not None:
+            return model
+
+        with self._lock:
+            # Another thread may have loaded it while this one was waiting
+            if name not in self._models:
+                rss_before = current_rss()
+                t0 = time.perf_counter()
+                self._models[name] = self._loaders[name]()
+                rss_after = current_rss()
+                self._stats[name] = {
+                    'load_seconds': time.perf_counter() - t0,
+                    'rss_delta_bytes': rss_after - rss_before if rss_before is not None else None,
+                    'rss_after_bytes': rss_after,
+                }
+            return self._models[name]
+
+    def preload(self, names=None):
+        """
+        Loads models eagerly, e.g. in the gunicorn master before workers are forked.
+
+        Args:
+        - names (Iterable[str]): Models to load. Defaults to every registered model.
+        """
+        for name in names or list(self._loaders):
+            self.get(name)
+
+    def stats(self) -> Dict[str, dict]:
+        """
+        Returns load time and memory usage of every registered model.
+        """
+        return {
+            name: {'loaded': name in self._models, **self._stats.get(name, {})}
+            for name in self._loaders
+        }
+
+def load_distilbert():
+    if DISTILBERT_BACKEND != 'torch':
+        from onnx_backend import OnnxSentimentPipeline
+        return OnnxSentimentPipeline(
+            quantize=DISTILBERT_BACKEND == 'onnx-int8',
+            num_threads=int(os.environ.get('SENTIMENT_TORCH_THREADS', 0)),
+        )
+
+    # Create a sentiment analysis pipeline using the pretrained model
+    # This uses the DistilBERT model fine-tuned for sentiment analysis
+    from transformers import pipeline
+    return pipeline('text-classification', model=DISTILBERT_MODEL)
+
+def load_tokenizer():
+    # Only the tokenizer files, so the token windows of custom model requests do not load DistilBERT
+    from transformers import AutoTokenizer
+    return AutoTokenizer.from_pretrained(DISTILBERT_MODEL)
+
+def load_custom_model():
+    import cloudpickle
+
+    # Experiment that might be able to fix "cannot instantiate 'WindowsPath' on your system"
+    import pathlib
+    import platform
+    if platform.system() != 'Windows':
+        pathlib.WindowsPath = pathlib.PosixPath
+
+    with open(CUSTOM_MODEL_PATH, 'rb') as file:
+        return cloudpickle.load(file)
+
+@functools.lru_cache(maxsize=None)
+def custom_model_hash() -> str:
+    """
+    Hash of the pickled custom model, so cached results are invalidated when it is retrained.
+    """
+    with open(CUSTOM_MODEL_PATH, 'rb') as file:
+        return hashlib.sha256(file.read()).hexdigest()[:16]
+
+registry = ModelRegistry()
+registry.register('distilbert', load_distilbert)
+registry.register('tokenizer', load_tokenizer)
+registry.register('custom', load_custom_model)
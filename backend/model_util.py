@@ -1,21 +1,80 @@
-from typing import List
-from transformers import pipeline
-import cloudpickle
+import hashlib
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Tuple
+import numpy as np
+from inference_scheduler import MicroBatchScheduler
+import metrics
+from model_registry import DISTILBERT_BACKEND, DISTILBERT_MODEL, custom_model_hash, registry
 
-# Experiment that might be able to fix "cannot instantiate 'WindowsPath' on your system"
-import pathlib
-import platform
-plt = platform.system()
-if plt != 'Windows': pathlib.WindowsPath = pathlib.PosixPath
+# Maximum number of chunks sent to the model in a single inference call
+BATCH_SIZE = int(os.environ.get('SENTIMENT_BATCH_SIZE', 32))
 
-# Create a sentiment analysis pipeline using the pretrained model
-# This uses the DistilBERT model fine-tuned for sentiment analysis
-# (distilbert-base-uncased-finetuned-sst-2-english)
-distilbert = pipeline("text-classification", model="distilbert/distilbert-base-uncased-finetuned-sst-2-english")
+# How segments are split into windows before inference:
+# - 'token': tokenize each segment once and slide over token offsets (default)
+# - 'word': the original word-based `chunk_text` windows, kept for comparison
+WINDOW_MODE = os.environ.get('SENTIMENT_WINDOW_MODE', 'token')
 
-# Load the custom trained Support Vector Regressor model from a file
-with open("../ml_model/svr_pipeline.pkl", "rb") as file:
-    custom_model = cloudpickle.load(file)
+# DistilBERT accepts at most 512 tokens, two of which are [CLS] and [SEP]
+MAX_MODEL_TOKENS = 512
+WINDOW_TOKENS = int(os.environ.get('SENTIMENT_WINDOW_TOKENS', 128))
+WINDOW_STRIDE = int(os.environ.get('SENTIMENT_WINDOW_STRIDE', 96))
+
+# Cross-request micro-batching: when enabled, windows from concurrent requests share model calls
+USE_SCHEDULER = os.environ.get('SENTIMENT_SCHEDULER', '0') == '1'
+SCHEDULER_MAX_WAIT_MS = float(os.environ.get('SENTIMENT_SCHEDULER_MAX_WAIT_MS', 5))
+SCHEDULER_MAX_QUEUE = int(os.environ.get('SENTIMENT_SCHEDULER_MAX_QUEUE', 4096))
+
+# Custom model inputs with at least CUSTOM_POOL_MIN_WINDOWS windows are split across
+# CUSTOM_POOL_WORKERS processes; 0 or 1 worker keeps everything in this process
+CUSTOM_POOL_WORKERS = int(os.environ.get('SENTIMENT_CUSTOM_POOL_WORKERS', 0))
+CUSTOM_POOL_MIN_WINDOWS = int(os.environ.get('SENTIMENT_CUSTOM_POOL_MIN_WINDOWS', 2000))
+
+# Segments scored together by the streaming functions before their results are yielded. The
+# first group is small so the first result arrives quickly; later groups double in size up to
+# STREAM_MAX_GROUP_SIZE, so long inputs are still scored in large batches
+STREAM_GROUP_SIZE = int(os.environ.get('SENTIMENT_STREAM_GROUP_SIZE', 1))
+STREAM_MAX_GROUP_SIZE = int(os.environ.get('SENTIMENT_STREAM_MAX_GROUP_SIZE', BATCH_SIZE))
+
+if not 0 < WINDOW_TOKENS <= MAX_MODEL_TOKENS - 2:
+    raise ValueError(f'SENTIMENT_WINDOW_TOKENS must be between 1 and {MAX_MODEL_TOKENS - 2}')
+if not 0 < WINDOW_STRIDE <= WINDOW_TOKENS:
+    raise ValueError('SENTIMENT_WINDOW_STRIDE must be between 1 and SENTIMENT_WINDOW_TOKENS')
+
+class Window(NamedTuple):
+    """
+    A piece of a segment that is classified on its own.
+
+    Attributes:
+    - text (str): The window text, used by the custom model and the word-based mode.
+    - input_ids (List[int] | None): DistilBERT token ids without special tokens, or None in word mode.
+    """
+    text: str
+    input_ids: List[int] = None
+
+def model_name(use_custom_model: bool) -> str:
+    """
+    Returns the name of the selected model.
+    """
+    return 'custom' if use_custom_model else 'distilbert'
+
+def model_version(use_custom_model: bool) -> str:
+    """
+    Describes the selected model and the windowing settings that affect its output.
+
+    Args:
+    - use_custom_model (bool): Whether to use the custom trained model.
+
+    Returns:
+    - str: A version string, used to key cached results.
+    """
+    # The int8 backend gives slightly different scores, so the backend is part of the version
+    model = custom_model_hash() if use_custom_model else f'{DISTILBERT_MODEL}@{DISTILBERT_BACKEND}'
+    if WINDOW_MODE == 'word':
+        return f'{model}:word'
+    return f'{model}:token:{WINDOW_TOKENS}:{WINDOW_STRIDE}'
 
 def chunk_text(text: str, max_word_count: int = 400, overlap: int = 20) -> List[str]:
     """
@@ -32,46 +91,361 @@ def chunk_text(text: str, max_word_count: int = 400, overlap: int = 20) -> List[
     words = text.split(' ')
     chunks = []
     for i in range(0, len(words), max_word_count - overlap):
-        chunk = ' '.join(words[i:i + max_word_count])
-        print('Chunking text: ', chunk, '\n\n')  # Debugging
-        chunks.append(chunk)
+        chunks.append(' '.join(words[i:i + max_word_count]))
     return chunks
 
-def get_total_sentiment(text: str, use_custom_model: bool) -> List[float]:
+def tokenize(texts: List[str]) -> List[Tuple[List[int], List[Tuple[int, int]]]]:
     """
-    Calculates the overall sentiment of the text using the selected model.
+    Tokenizes texts with the DistilBERT tokenizer in a single batched call.
 
     Args:
-    - text (str): The input text for sentiment analysis.
-    - use_custom_model (bool): Whether to use the custom trained model.
+    - texts (List[str]): The texts to tokenize.
 
     Returns:
-    - List[float]: Average probabilities for negative and positive sentiment.
+    - List[Tuple[List[int], List[Tuple[int, int]]]]: Token ids (without special tokens) and their
+      character offsets, for each text.
+    """
+    encoding = registry.get('tokenizer')(texts, add_special_tokens=False, return_offsets_mapping=True, verbose=False)
+    return list(zip(encoding['input_ids'], encoding['offset_mapping']))
+
+def windows_from_tokens(text: str, ids: List[int], offsets: List[Tuple[int, int]], max_tokens: int = WINDOW_TOKENS, stride: int = WINDOW_STRIDE) -> List[Window]:
+    """
+    Splits an already tokenized text into token windows.
+
+    Windows are slices of the token ids, so no window is re-tokenized or truncated by the
+    model. The text of each window is cut from the original string using the token offsets.
+
+    Args:
+    - text (str): The tokenized text.
+    - ids (List[int]): Its token ids, without special tokens.
+    - offsets (List[Tuple[int, int]]): Character offsets of each token.
+    - max_tokens (int): Maximum number of tokens per window, excluding special tokens.
+    - stride (int): Number of tokens between the starts of consecutive windows.
+
+    Returns:
+    - List[Window]: List of token windows. Empty text gives a single empty window.
+    """
+    if not ids:
+        return [Window(text='', input_ids=[])]
+
+    windows = []
+    start = 0
+    while True:
+        end = min(start + max_tokens, len(ids))
+        windows.append(Window(
+            text=text[offsets[start][0]:offsets[end - 1][1]],
+            input_ids=ids[start:end],
+        ))
+        # Stop once the window reaches the end, so no window is contained in the previous one
+        if end == len(ids):
+            return windows
+        start += stride
+
+def chunk_tokens(text: str, max_tokens: int = WINDOW_TOKENS, stride: int = WINDOW_STRIDE) -> List[Window]:
+    """
+    Splits text into token windows using the DistilBERT tokenizer.
+
+    Args:
+    - text (str): The input text to be chunked.
+    - max_tokens (int): Maximum number of tokens per window, excluding special tokens.
+    - stride (int): Number of tokens between the starts of consecutive windows.
+
+    Returns:
+    - List[Window]: List of token windows. Empty text gives a single empty window.
+    """
+    ids, offsets = tokenize([text])[0]
+    return windows_from_tokens(text, ids, offsets, max_tokens=max_tokens, stride=stride)
+
+def window_key(window: Window) -> bytes:
+    """
+    Content hash of a window, used to classify identical windows only once per request.
+
+    Args:
+    - window (Window): The window to hash.
+
+    Returns:
+    - bytes: A 16 byte digest of the window content.
+    """
+    content = window.text if window.input_ids is None else ','.join(map(str, window.input_ids))
+    return hashlib.blake2b(content.encode('utf-8'), digest_size=16).digest()
+
+def distilbert_on_ids(batch_ids: List[List[int]]) -> List[List[float]]:
+    """
+    Runs DistilBERT on already tokenized windows, skipping the pipeline's tokenization.
+
+    Args:
+    - batch_ids (List[List[int]]): Token ids of each window, without special tokens.
+
+    Returns:
+    - List[List[float]]: [negative, positive] probabilities for each window.
+    """
+    import torch
+
+    distilbert = registry.get('distilbert')
+    tokenizer = distilbert.tokenizer
+    encoded = tokenizer.pad(
+        {'input_ids': [tokenizer.build_inputs_with_special_tokens(ids) for ids in batch_ids]},
+        return_tensors='pt',
+    )
+    with torch.inference_mode():
+        logits = distilbert.model(**encoded).logits
+    probabilities = logits.softmax(dim=-1)
+
+    label2id = distilbert.model.config.label2id
+    return probabilities[:, [label2id['NEGATIVE'], label2id['POSITIVE']]].tolist()
+
+def to_probabilities(result: list, use_custom_model: bool) -> List[List[float]]:
     """
-    # Split the text into smaller chunks for processing
-    chunks = chunk_text(text=text, max_word_count=100, overlap=50)  # TODO: Adjust parameters as needed
+    Converts raw model output into [negative, positive] probability pairs.
 
-    # Perform sentiment analysis on each chunk using the selected model
-    result = distilbert(chunks) if not use_custom_model else custom_model.predict(chunks)
+    Args:
+    - result (list): Output of the DistilBERT pipeline (list of label/score dicts) or the custom model's `predict` (positive probabilities).
+    - use_custom_model (bool): Whether the output comes from the custom trained model.
 
-    # Convert model output to probabilities
+    Returns:
+    - List[List[float]]: One [negative, positive] pair per model input.
+    """
     if not use_custom_model:
-        all_probabilities = [
+        return [
             [tmp['score'], 1 - tmp['score']] if tmp['label'] == 'NEGATIVE' else [1 - tmp['score'], tmp['score']]
             for tmp in result
         ]
-    else:
-        all_probabilities = [[1 - pos_prob, pos_prob] for pos_prob in result]
+    return [[1 - pos_prob, pos_prob] for pos_prob in result]
 
-    print('Sentiment probabilities:', all_probabilities)  # Debugging
+def classify_windows(windows: List[Window], use_custom_model: bool, batch_size: int = None) -> List[List[float]]:
+    """
+    Runs windows through the selected model in length-bucketed batches.
 
-    # Calculate average probabilities
-    average_probabilities = [
-        sum(p[0] for p in all_probabilities) / len(chunks),
-        sum(p[1] for p in all_probabilities) / len(chunks)
-    ]
+    Windows are sorted by length before batching so that each batch pads to a similar
+    length, then the probabilities are put back in the original window order.
+
+    Args:
+    - windows (List[Window]): Windows to classify.
+    - use_custom_model (bool): Whether to use the custom trained model.
+    - batch_size (int): Maximum number of windows per model call. Defaults to `BATCH_SIZE`.
+
+    Returns:
+    - List[List[float]]: [negative, positive] probabilities for each window, in input order.
+    """
+    batch_size = batch_size or BATCH_SIZE
+
+    # Bucket windows of similar length together to keep padding per batch small
+    def length(i):
+        return len(windows[i].text) if windows[i].input_ids is None else len(windows[i].input_ids)
+    order = sorted(range(len(windows)), key=length)
+
+    probabilities = [None] * len(windows)
+    for batch_start in range(0, len(order), batch_size):
+        batch_indices = order[batch_start:batch_start + batch_size]
+        batch = [windows[i] for i in batch_indices]
+
+        # Perform sentiment analysis on the whole batch in one call
+        if use_custom_model:
+            result = to_probabilities(registry.get('custom').predict([w.text for w in batch]), use_custom_model)
+        elif all(w.input_ids is not None for w in batch):
+            result = distilbert_on_ids([w.input_ids for w in batch])
+        else:
+            result = to_probabilities(registry.get('distilbert')([w.text for w in batch], batch_size=len(batch)), use_custom_model)
+
+        for i, prob in zip(batch_indices, result):
+            probabilities[i] = prob
+
+    return probabilities
+
+# Process pool for very large custom model inputs, created on first use
+_custom_pool = None
+_custom_pool_lock = threading.Lock()
+
+def _predict_custom_part(texts: List[str]) -> np.ndarray:
+    """
+    Runs the custom model on part of the windows inside a pool worker.
+    """
+    return np.asarray(registry.get('custom').predict(texts), dtype=np.float64)
+
+def predict_custom(texts: List[str]) -> np.ndarray:
+    """
+    Runs all windows through the custom model's vectorizer and regressor in a single `predict`.
+
+    Inputs with at least `CUSTOM_POOL_MIN_WINDOWS` windows are split evenly across a pool of
+    `CUSTOM_POOL_WORKERS` processes. Each window is scored independently, so the output is
+    the same either way.
+
+    Args:
+    - texts (List[str]): Window texts.
+
+    Returns:
+    - np.ndarray: Positive probability of each window.
+    """
+    global _custom_pool
+
+    if CUSTOM_POOL_WORKERS <= 1 or len(texts) < CUSTOM_POOL_MIN_WINDOWS:
+        return _predict_custom_part(texts)
+
+    with _custom_pool_lock:
+        if _custom_pool is None:
+            # Spawned (not forked) workers, since the server process runs several threads
+            _custom_pool = ProcessPoolExecutor(
+                max_workers=CUSTOM_POOL_WORKERS,
+                mp_context=multiprocessing.get_context('spawn'),
+            )
+
+    part_size = -(-len(texts) // CUSTOM_POOL_WORKERS)  # Ceiling division
+    parts = [texts[i:i + part_size] for i in range(0, len(texts), part_size)]
+    return np.concatenate(list(_custom_pool.map(_predict_custom_part, parts)))
+
+# One scheduler per model, created on first use
+_schedulers = {}
+_schedulers_lock = threading.Lock()
+
+def get_scheduler(use_custom_model: bool) -> MicroBatchScheduler:
+    """
+    Returns the micro-batching scheduler of the selected model, creating it on first use.
+
+    Args:
+    - use_custom_model (bool): Whether to use the custom trained model.
+
+    Returns:
+    - MicroBatchScheduler: Scheduler whose items are `Window`s and outputs [negative, positive] pairs.
+    """
+    use_custom_model = bool(use_custom_model)
+    with _schedulers_lock:
+        if use_custom_model not in _schedulers:
+            _schedulers[use_custom_model] = MicroBatchScheduler(
+                predict_fn=lambda windows: classify_windows(windows=windows, use_custom_model=use_custom_model),
+                max_batch_size=BATCH_SIZE,
+                max_wait_ms=SCHEDULER_MAX_WAIT_MS,
+                max_queue_size=SCHEDULER_MAX_QUEUE,
+            )
+        return _schedulers[use_custom_model]
+
+def scheduler_queue_sizes() -> Dict[str, int]:
+    """
+    Returns the number of windows waiting in the scheduler of each model started so far.
+    """
+    with _schedulers_lock:
+        return {model_name(use_custom_model): scheduler.queue_size() for use_custom_model, scheduler in _schedulers.items()}
+
+def get_batched_sentiment(texts: List[str], use_custom_model: bool, batch_size: int = None, window_memo: Dict[bytes, List[float]] = None) -> List[List[float]]:
+    """
+    Calculates the overall sentiment of several texts with a single batched inference pass.
+
+    Every text is split into windows, the windows of all texts are classified together,
+    and the probabilities are averaged back per text. Identical windows are only
+    classified once.
+
+    Args:
+    - texts (List[str]): The input texts for sentiment analysis.
+    - use_custom_model (bool): Whether to use the custom trained model.
+    - batch_size (int): Maximum number of windows per model call. Defaults to `BATCH_SIZE`.
+    - window_memo (Dict[bytes, List[float]]): Probabilities of windows already classified, by
+      `window_key`. Reused and extended, so several calls of one request classify each window once.
+
+    Returns:
+    - List[List[float]]: Average probabilities for negative and positive sentiment, one pair per text.
+    """
+    if not texts:
+        return []
+
+    window_memo = {} if window_memo is None else window_memo
+    unique_windows = []  # Windows to classify, each distinct content appears once
+    unique_keys = []  # Content hash of every unique window
+    memo = {}  # Content hash -> index into unique_windows
+    text_indices = []  # Text index of every window of every text
+    window_indices = []  # Unique window index of every window of every text
+
+    # Tokenize every text at once; the word-based mode has no tokenization step
+    if WINDOW_MODE != 'word':
+        with metrics.timed('tokenization'):
+            encodings = tokenize(texts)
+
+    with metrics.timed('chunking'):
+        for text_idx, text in enumerate(texts):
+            if WINDOW_MODE == 'word':
+                # TODO: Adjust parameters as needed
+                windows = [Window(text=chunk) for chunk in chunk_text(text=text, max_word_count=100, overlap=50)]
+            else:
+                windows = windows_from_tokens(text, *encodings[text_idx])
+
+            for window in windows:
+                key = window_key(window)
+                if key not in memo:
+                    memo[key] = len(unique_windows)
+                    unique_windows.append(window)
+                    unique_keys.append(key)
+                text_indices.append(text_idx)
+                window_indices.append(memo[key])
+
+    metrics.request_size.observe('windows', len(window_indices))
+
+    # Only windows not classified by an earlier call of the same request go to the model
+    new_indices = [i for i, key in enumerate(unique_keys) if key not in window_memo]
+    new_windows = [unique_windows[i] for i in new_indices]
+
+    with metrics.timed('inference'):
+        if not new_windows:
+            new_probabilities = np.empty((0, 2))
+        elif USE_SCHEDULER:
+            # Share model calls with concurrent requests; raises QueueFullError under overload
+            new_probabilities = np.asarray(get_scheduler(use_custom_model).submit(new_windows).result())
+        elif use_custom_model:
+            # The custom model is cheap to run on everything at once, so skip the length batching
+            positive = predict_custom([w.text for w in new_windows])
+            new_probabilities = np.column_stack([1 - positive, positive])
+        else:
+            new_probabilities = np.asarray(classify_windows(windows=new_windows, use_custom_model=use_custom_model, batch_size=batch_size))
 
-    return average_probabilities
+    for i, prob in zip(new_indices, new_probabilities.tolist()):
+        window_memo[unique_keys[i]] = prob
+
+    # Calculate average probabilities per text with index reductions; bincount adds the
+    # windows in order, so the sums match a plain Python loop exactly
+    with metrics.timed('aggregation'):
+        unique_probabilities = np.asarray([window_memo[key] for key in unique_keys], dtype=np.float64)
+        text_indices = np.asarray(text_indices)
+        probabilities = unique_probabilities[np.asarray(window_indices)]
+        counts = np.bincount(text_indices, minlength=len(texts))
+        negative_sums = np.bincount(text_indices, weights=probabilities[:, 0], minlength=len(texts))
+        positive_sums = np.bincount(text_indices, weights=probabilities[:, 1], minlength=len(texts))
+
+        return np.column_stack([negative_sums / counts, positive_sums / counts]).tolist()
+
+def get_total_sentiment(text: str, use_custom_model: bool) -> List[float]:
+    """
+    Calculates the overall sentiment of the text using the selected model.
+
+    Args:
+    - text (str): The input text for sentiment analysis.
+    - use_custom_model (bool): Whether to use the custom trained model.
+
+    Returns:
+    - List[float]: Average probabilities for negative and positive sentiment.
+    """
+    return get_batched_sentiment(texts=[text], use_custom_model=use_custom_model)[0]
+
+def get_max_word_count(text: str) -> int:
+    """
+    Calculates the maximum word count per segment based on text length.
+    """
+    words_count = text.count(' ') + 1  # Same as len(text.split(' ')) without building the list
+    metrics.request_size.observe('words', words_count)
+    return (
+        20 if words_count <= 100 else
+        50 if words_count <= 250 else
+        100 if words_count <= 250 else
+        150
+    )
+
+def get_second_split(transcript: list) -> int:
+    """
+    Determines the segment split duration based on video length.
+    """
+    # Calculate the total video length using the last transcript segment
+    video_length = transcript[-1]['start'] + transcript[-1]['duration']
+    return (
+        20 if video_length <= 150 else
+        40 if video_length <= 300 else
+        60
+    )
 
 def get_segmented_sentiment_youtubecaption(data: List[dict], second: int, use_custom_model: bool) -> List[List[float]]:
     """
@@ -88,25 +462,25 @@ def get_segmented_sentiment_youtubecaption(data: List[dict], second: int, use_cu
     chunks = []  # Stores text segments
     start_time_of_chunk = []  # Stores start times of segments
 
-    for i in data:
-        # Determine segment index by start time; "duration" is not used in this logic
-        idx = int(i['start'] / second)  # Determine segment index by start time
-
-        # Ensure the chunk lists are long enough
-        while idx >= len(chunks):
-            chunks.append('')
-            start_time_of_chunk.append(-1)
-
-        # Append text to the appropriate segment
-        chunks[idx] += i['text'] + ' '
-        if start_time_of_chunk[idx] == -1:
-            start_time_of_chunk[idx] = i['start']
-
-    # Perform sentiment analysis for each segment
-    all_probabilities = [
-        get_total_sentiment(text=chunk, use_custom_model=use_custom_model)
-        for chunk in chunks
-    ]
+    with metrics.timed('segmentation'):
+        for i in data:
+            # Determine segment index by start time; "duration" is not used in this logic
+            idx = int(i['start'] / second)  # Determine segment index by start time
+
+            # Ensure the chunk lists are long enough
+            while idx >= len(chunks):
+                chunks.append('')
+                start_time_of_chunk.append(-1)
+
+            # Append text to the appropriate segment
+            chunks[idx] += i['text'] + ' '
+            if start_time_of_chunk[idx] == -1:
+                start_time_of_chunk[idx] = i['start']
+
+    metrics.request_size.observe('segments', len(chunks))
+
+    # Perform sentiment analysis for all segments in one batched pass
+    all_probabilities = get_batched_sentiment(texts=chunks, use_custom_model=use_custom_model)
 
     # Combine results with start times
     return [
@@ -126,21 +500,145 @@ def get_segmented_sentiment_wordcount(text: str, max_word_count: int, use_custom
     Returns:
     - List[List[float]]: List of sentiment probabilities with starting word indices.
     """
-    # Split the text into chunks
-    chunks = chunk_text(text=text, max_word_count=max_word_count, overlap=0)
+    with metrics.timed('segmentation'):
+        # Split the text into chunks
+        chunks = chunk_text(text=text, max_word_count=max_word_count, overlap=0)
 
-    # Calculate starting indices for each chunk
-    words = text.split(' ')
-    starting_indices = [i for i in range(0, len(words), max_word_count)]
+        # Calculate starting indices for each chunk
+        starting_indices = [i * max_word_count for i in range(len(chunks))]
 
-    # Perform sentiment analysis for each chunk
-    all_probabilities = [
-        get_total_sentiment(text=chunk, use_custom_model=use_custom_model)
-        for chunk in chunks
-    ]
+    metrics.request_size.observe('segments', len(chunks))
+
+    # Perform sentiment analysis for all chunks in one batched pass
+    all_probabilities = get_batched_sentiment(texts=chunks, use_custom_model=use_custom_model)
 
     # Combine results with starting indices
     return [
         [all_probabilities[i][0], all_probabilities[i][1], starting_indices[i]]
         for i in range(len(chunks))
     ]
+
+def iter_youtubecaption_segments(data: Iterable[dict], second: int) -> Iterator[Tuple[str, float]]:
+    """
+    Lazily groups YouTube captions into time-based segments.
+
+    Produces the same segments as `get_segmented_sentiment_youtubecaption`, including empty
+    segments with start time -1 for gaps, assuming the captions are sorted by start time
+    as returned by YouTube.
+
+    Args:
+    - data (Iterable[dict]): Caption segments with "start" and "text" fields.
+    - second (int): Time duration for each segment in seconds.
+
+    Yields:
+    - Tuple[str, float]: Segment text and the start time of its first caption.
+    """
+    current_idx = 0
+    text = ''
+    start_time = -1
+
+    for i in data:
+        idx = int(i['start'] / second)
+
+        # Flush the current segment and any empty segments between it and the new one
+        while idx > current_idx:
+            yield text, start_time
+            current_idx += 1
+            text = ''
+            start_time = -1
+
+        text += i['text'] + ' '
+        if start_time == -1:
+            start_time = i['start']
+
+    # The last segment always holds a caption, unless there were no captions at all
+    if start_time != -1:
+        yield text, start_time
+
+def iter_wordcount_segments(text: str, max_word_count: int) -> Iterator[Tuple[str, int]]:
+    """
+    Lazily splits text into word-based segments without building a list of all words.
+
+    Produces the same segments as `chunk_text(text, max_word_count, overlap=0)`.
+
+    Args:
+    - text (str): Input text to split.
+    - max_word_count (int): Maximum number of words per segment.
+
+    Yields:
+    - Tuple[str, int]: Segment text and the index of its first word.
+    """
+    start = 0
+    word_index = 0
+    while True:
+        # Find the position just after the `max_word_count`-th space from `start`
+        pos = start
+        for _ in range(max_word_count):
+            pos = text.find(' ', pos)
+            if pos == -1:
+                break
+            pos += 1
+
+        if pos == -1:
+            yield text[start:], word_index
+            return
+
+        yield text[start:pos - 1], word_index
+        start = pos
+        word_index += max_word_count
+
+def iter_scored_segments(segments: Iterable[Tuple[str, float]], use_custom_model: bool, group_size: int = None, max_group_size: int = None) -> Iterator[List[float]]:
+    """
+    Scores segments as they arrive and yields each result as soon as it is ready.
+
+    Segments are scored in groups with `get_batched_sentiment`, so only one group is held
+    in memory at a time. The first group has `group_size` segments and every later group
+    doubles, up to `max_group_size`. Windows seen in an earlier group are not classified again.
+
+    Args:
+    - segments (Iterable[Tuple[str, float]]): (text, position) pairs, e.g. from `iter_youtubecaption_segments`.
+    - use_custom_model (bool): Whether to use the custom trained model.
+    - group_size (int): Number of segments in the first group. Defaults to `STREAM_GROUP_SIZE`.
+    - max_group_size (int): Largest number of segments per group. Defaults to `STREAM_MAX_GROUP_SIZE`.
+
+    Yields:
+    - List[float]: [negative, positive, position] for each segment, in input order.
+    """
+    group_size = group_size or STREAM_GROUP_SIZE
+    max_group_size = max(group_size, max_group_size or STREAM_MAX_GROUP_SIZE)
+    window_memo = {}
+    group = []
+
+    def score(group):
+        probabilities = get_batched_sentiment(texts=[text for text, _ in group], use_custom_model=use_custom_model, window_memo=window_memo)
+        for (_, position), prob in zip(group, probabilities):
+            yield [prob[0], prob[1], position]
+
+    # Segmentation is lazy here; its time is summed and recorded once per request, like the other paths
+    for segment in metrics.timed_iter(segments, 'segmentation'):
+        group.append(segment)
+        if len(group) >= group_size:
+            yield from score(group)
+            group = []
+            group_size = min(group_size * 2, max_group_size)
+
+    if group:
+        yield from score(group)
+
+def iter_segmented_sentiment_youtubecaption(data: Iterable[dict], second: int, use_custom_model: bool) -> Iterator[List[float]]:
+    """
+    Streaming variant of `get_segmented_sentiment_youtubecaption`.
+
+    Yields:
+    - List[float]: [negative, positive, start time] for each segment as soon as it is scored.
+    """
+    return iter_scored_segments(iter_youtubecaption_segments(data, second), use_custom_model=use_custom_model)
+
+def iter_segmented_sentiment_wordcount(text: str, max_word_count: int, use_custom_model: bool) -> Iterator[List[float]]:
+    """
+    Streaming variant of `get_segmented_sentiment_wordcount`.
+
+    Yields:
+    - List[float]: [negative, positive, starting word index] for each segment as soon as it is scored.
+    """
+    return iter_scored_segments(iter_wordcount_segments(text, max_word_count), use_custom_model=use_custom_model)
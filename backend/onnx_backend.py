@@ -0,0 +1,207 @@
+"""
+ONNX Runtime backend for the DistilBERT sentiment model.
+
+Exports the SST-2 DistilBERT model to ONNX (optionally dynamically quantized to int8) and
+wraps the ONNX Runtime session in `OnnxSentimentPipeline`, which has the same interface
+as the transformers `pipeline` object used by `model_util`: it is callable on a list of
+texts and exposes `.tokenizer` and `.model` (returning `.logits` for `input_ids` and
+`attention_mask` tensors).
+
+The models must be exported before the server starts; they are never exported on demand,
+since several workers would race to write the same files. Export and parity check, from
+the `backend` directory:
+    python onnx_backend.py export --quantize
+    python onnx_backend.py parity --quantize
+"""
+import argparse
+import os
+from types import SimpleNamespace
+from typing import Dict, List
+
+import numpy as np
+
+from model_registry import DISTILBERT_MODEL
+
+# Directory holding the exported models and the tokenizer
+ONNX_DIR = os.environ.get(
+    'SENTIMENT_ONNX_DIR',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'onnx_models'),
+)
+FP32_FILE = 'distilbert-sst2.onnx'
+INT8_FILE = 'distilbert-sst2.int8.onnx'
+
+def model_path(quantize: bool, onnx_dir: str = ONNX_DIR) -> str:
+    return os.path.join(onnx_dir, INT8_FILE if quantize else FP32_FILE)
+
+def _tmp_path(path: str) -> str:
+    return f'{path}.{os.getpid()}.tmp'
+
+def export_onnx(onnx_dir: str = ONNX_DIR, quantize: bool = False) -> str:
+    """
+    Exports DistilBERT to ONNX, and optionally a dynamically quantized int8 copy.
+
+    Each model is written to a temporary file and renamed into place, so a reader never
+    sees a half written model.
+
+    Args:
+    - onnx_dir (str): Output directory.
+    - quantize (bool): Also write the int8 model.
+
+    Returns:
+    - str: Path of the requested model.
+    """
+    import torch
+    from transformers import AutoModelForSequenceClassification, AutoTokenizer
+
+    os.makedirs(onnx_dir, exist_ok=True)
+    fp32_path = model_path(False, onnx_dir)
+
+    if not os.path.exists(fp32_path):
+        # Save the tokenizer and config first, so a model file in place implies they are complete
+        tokenizer = AutoTokenizer.from_pretrained(DISTILBERT_MODEL)
+        tokenizer.save_pretrained(onnx_dir)
+        model = AutoModelForSequenceClassification.from_pretrained(DISTILBERT_MODEL)
+        model.config.save_pretrained(onnx_dir)
+        model.eval()
+        model.config.return_dict = False  # Export a plain (logits,) tuple output
+
+        sample = tokenizer(['an example sentence', 'another one'], padding=True, return_tensors='pt')
+        torch.onnx.export(
+            model,
+            (sample['input_ids'], sample['attention_mask']),
+            _tmp_path(fp32_path),
+            input_names=['input_ids', 'attention_mask'],
+            output_names=['logits'],
+            dynamic_axes={
+                'input_ids': {0: 'batch', 1: 'sequence'},
+                'attention_mask': {0: 'batch', 1: 'sequence'},
+                'logits': {0: 'batch'},
+            },
+            opset_version=14,
+        )
+        os.replace(_tmp_path(fp32_path), fp32_path)
+
+    if not quantize:
+        return fp32_path
+
+    int8_path = model_path(True, onnx_dir)
+    if not os.path.exists(int8_path):
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+        quantize_dynamic(fp32_path, _tmp_path(int8_path), weight_type=QuantType.QInt8)
+        os.replace(_tmp_path(int8_path), int8_path)
+    return int8_path
+
+class _OnnxModel:
+    """
+    Mimics the part of the transformers model used by `model_util`: `config` and a call returning `.logits`.
+    """
+    def __init__(self, session, config):
+        self.session = session
+        self.config = config
+
+    def __call__(self, input_ids, attention_mask, **kwargs):
+        import torch
+
+        (logits,) = self.session.run(['logits'], {
+            'input_ids': input_ids.numpy().astype(np.int64),
+            'attention_mask': attention_mask.numpy().astype(np.int64),
+        })
+        return SimpleNamespace(logits=torch.from_numpy(logits))
+
+class OnnxSentimentPipeline:
+    """
+    Drop-in replacement for the DistilBERT text-classification pipeline, running on ONNX Runtime.
+
+    Args:
+    - quantize (bool): Use the int8 model instead of the fp32 one.
+    - onnx_dir (str): Directory with the models written by `export_onnx`.
+    - num_threads (int): ONNX Runtime intra-op threads. 0 lets ONNX Runtime decide.
+    """
+    def __init__(self, quantize: bool = False, onnx_dir: str = ONNX_DIR, num_threads: int = 0):
+        import onnxruntime as ort
+        from transformers import AutoConfig, AutoTokenizer
+
+        path = model_path(quantize, onnx_dir)
+        if not os.path.exists(path):
+            raise FileNotFoundError(
+                f'{path} does not exist; export it first with '
+                f'`python onnx_backend.py export{" --quantize" if quantize else ""}`'
+            )
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.intra_op_num_threads = num_threads
+
+        self.tokenizer = AutoTokenizer.from_pretrained(onnx_dir)
+        self.model = _OnnxModel(
+            session=ort.InferenceSession(path, options, providers=['CPUExecutionProvider']),
+            config=AutoConfig.from_pretrained(onnx_dir),
+        )
+
+    def __call__(self, texts: List[str], batch_size: int = None, truncation: bool = True, **kwargs) -> List[Dict]:
+        """
+        Classifies texts like the transformers pipeline does.
+
+        Returns:
+        - List[Dict]: One {'label', 'score'} dict per text with the most likely label.
+        """
+        if isinstance(texts, str):
+            texts = [texts]
+        batch_size = batch_size or len(texts)
+
+        out = []
+        for start in range(0, len(texts), batch_size):
+            encoded = self.tokenizer(texts[start:start + batch_size], padding=True, truncation=truncation, return_tensors='pt')
+            probabilities = self.model(**encoded).logits.softmax(dim=-1)
+            for row in probabilities.tolist():
+                label_id = int(np.argmax(row))
+                out.append({'label': self.model.config.id2label[label_id], 'score': row[label_id]})
+        return out
+
+def parity_check(reference, candidate, texts: List[str]) -> Dict[str, float]:
+    """
+    Compares the positive probabilities of two pipelines on the same texts.
+
+    Args:
+    - reference: The PyTorch pipeline.
+    - candidate: The pipeline to check, e.g. an `OnnxSentimentPipeline`.
+    - texts (List[str]): Texts to classify.
+
+    Returns:
+    - Dict[str, float]: Maximum and mean absolute difference of the positive probability,
+      and the fraction of texts where both agree on the label.
+    """
+    def positive(results):
+        return np.array([r['score'] if r['label'] == 'POSITIVE' else 1 - r['score'] for r in results])
+
+    expected = positive(reference(texts, batch_size=32, truncation=True))
+    actual = positive(candidate(texts, batch_size=32, truncation=True))
+    diff = np.abs(expected - actual)
+    return {
+        'max_abs_diff': float(diff.max()),
+        'mean_abs_diff': float(diff.mean()),
+        'label_agreement': float(np.mean((expected > 0.5) == (actual > 0.5))),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('command', choices=['export', 'parity'])
+    parser.add_argument('--quantize', action='store_true', help='Use the int8 dynamically quantized model')
+    parser.add_argument('--onnx-dir', default=ONNX_DIR, help='Where the ONNX models are stored')
+    parser.add_argument('--samples', type=int, default=256, help='Number of texts for the parity check')
+    args = parser.parse_args()
+
+    if args.command == 'export':
+        print(f'Exported {export_onnx(args.onnx_dir, quantize=args.quantize)}')
+        return
+
+    from transformers import pipeline
+    from benchmarks.synthetic import make_text
+
+    texts = [make_text(word_count=20 + i % 80, seed=i) for i in range(args.samples)]
+    reference = pipeline('text-classification', model=DISTILBERT_MODEL)
+    candidate = OnnxSentimentPipeline(quantize=args.quantize, onnx_dir=args.onnx_dir)
+    print(parity_check(reference, candidate, texts))
+
+if __name__ == '__main__':
+    main()
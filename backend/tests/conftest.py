@@ -0,0 +1,9 @@
+import os
+import sys
+import tempfile
+
+# Tests import the backend modules the same way the app does, from the backend directory
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+# Keep the metrics the tests record out of the real cache file
+os.environ.setdefault('SENTIMENT_METRICS_PATH', os.path.join(tempfile.mkdtemp(), 'metrics.sqlite3'))
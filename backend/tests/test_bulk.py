@@ -0,0 +1,148 @@
+"""
+Tests for the checkpoint and resume logic of bulk analysis and batch jobs, without models.
+"""
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import bulk
+import jobs
+
+def write_lines(path, records):
+    with open(path, 'w', encoding='utf-8') as file:
+        for record in records:
+            file.write(json.dumps(record) + '\n')
+
+def read_lines(path):
+    with open(path, encoding='utf-8') as file:
+        return [json.loads(line) for line in file]
+
+@pytest.fixture
+def stub_scoring(monkeypatch):
+    """
+    Runs `bulk.run` on threads with a stub `score_item`, returning the ids it scored.
+    """
+    scored = []
+
+    def score_item(item, use_custom_model):
+        scored.append(item['id'])
+        if item.get('text') == 'fail':
+            return {'id': item['id'], 'kind': 'text', 'error': 'ValueError: bad item'}
+        return {'id': item['id'], 'kind': 'text', 'result': [[0.5, 0.5, 0]]}
+
+    def pool(max_workers, mp_context, initializer, initargs):
+        return ThreadPoolExecutor(max_workers=max_workers)
+
+    monkeypatch.setattr(bulk, 'score_item', score_item)
+    monkeypatch.setattr(bulk, 'ProcessPoolExecutor', pool)
+    return scored
+
+def test_load_finished_cuts_off_half_written_line(tmp_path):
+    checkpoint = tmp_path / 'results.ndjson'
+    write_lines(checkpoint, [{'id': 'a', 'result': []}, {'id': 'b', 'result': []}])
+    with open(checkpoint, 'a', encoding='utf-8') as file:
+        file.write('{"id": "c", "res')
+
+    assert bulk.load_finished(str(checkpoint)) == {'a', 'b'}
+    assert [record['id'] for record in read_lines(checkpoint)] == ['a', 'b']
+
+def test_load_finished_leaves_errors_out_when_retrying(tmp_path):
+    checkpoint = tmp_path / 'results.ndjson'
+    write_lines(checkpoint, [{'id': 'a', 'result': []}, {'id': 'b', 'error': 'boom'}])
+
+    assert bulk.load_finished(str(checkpoint)) == {'a', 'b'}
+    assert bulk.load_finished(str(checkpoint), retry_errors=True) == {'a'}
+
+def test_load_finished_without_checkpoint(tmp_path):
+    assert bulk.load_finished(str(tmp_path / 'missing.ndjson')) == set()
+
+def test_rerun_skips_finished_items(tmp_path, stub_scoring):
+    items = tmp_path / 'items.jsonl'
+    write_lines(items, [{'id': 'a', 'text': 'x'}, {'id': 'b', 'text': 'y'}, {'text': 'z'}])
+    output = tmp_path / 'results.ndjson'
+    write_lines(output, [{'id': 'a', 'kind': 'text', 'result': []}])
+
+    summary = bulk.run(str(items), str(output), workers=2)
+
+    assert summary == {'total': 3, 'skipped': 1, 'scored': 2, 'failed': 0}
+    assert sorted(stub_scoring) == ['3', 'b']  # The item without an id is named by its line
+    assert sorted(record['id'] for record in read_lines(output)) == ['3', 'a', 'b']
+
+    # A second run has nothing left to do
+    assert bulk.run(str(items), str(output), workers=2)['skipped'] == 3
+
+def test_retry_errors_scores_failed_items_again(tmp_path, stub_scoring):
+    items = tmp_path / 'items.jsonl'
+    write_lines(items, [{'id': 'a', 'text': 'x'}, {'id': 'b', 'text': 'fail'}])
+    output = tmp_path / 'results.ndjson'
+
+    assert bulk.run(str(items), str(output), workers=1)['failed'] == 1
+    assert bulk.run(str(items), str(output), workers=1)['skipped'] == 2
+
+    summary = bulk.run(str(items), str(output), workers=1, retry_errors=True)
+    assert summary == {'total': 2, 'skipped': 1, 'scored': 0, 'failed': 1}
+    assert stub_scoring == ['a', 'b', 'b']
+
+def test_parquet_keeps_latest_record(tmp_path):
+    pq = pytest.importorskip('pyarrow.parquet')
+    checkpoint = tmp_path / 'results.parquet.checkpoint.ndjson'
+    write_lines(checkpoint, [
+        {'id': 'a', 'kind': 'text', 'error': 'boom'},
+        {'id': 'b', 'kind': 'text', 'result': [[0.1, 0.9, 0]]},
+        {'id': 'a', 'kind': 'text', 'result': [[0.2, 0.8, 0]]},
+    ])
+
+    bulk.write_parquet(str(checkpoint), str(tmp_path / 'results.parquet'))
+    rows = {row['id']: row for row in pq.read_table(tmp_path / 'results.parquet').to_pylist()}
+
+    assert rows['a']['result'] == [[0.2, 0.8, 0]]
+    assert rows['a']['error'] is None
+    assert rows['b']['result'] == [[0.1, 0.9, 0]]
+
+@pytest.fixture
+def job_path(tmp_path, monkeypatch):
+    """
+    A job directory with a status file, as `jobs.submit` creates it, without queuing it.
+    """
+    monkeypatch.setattr(jobs, 'JOBS_DIR', str(tmp_path))
+    monkeypatch.setattr(jobs, '_owner', None)  # The owner lock lives under JOBS_DIR
+    path = tmp_path / ('0' * 32)
+    path.mkdir()
+    jobs.write_status(str(path), state='queued', total=1, use_custom_model=False, format='ndjson')
+    return str(path)
+
+def test_status_counts_finished_lines(job_path):
+    with open(os.path.join(job_path, 'results.ndjson'), 'w', encoding='utf-8') as file:
+        file.write('{"id": "a"}\n{"id": "b"}\n{"id": "c"')
+
+    assert jobs.get_status(job_path)['finished'] == 2
+
+def test_running_job_without_lock_is_interrupted(job_path):
+    jobs.write_status(job_path, state='running')
+
+    assert jobs.get_status(job_path)['state'] == 'interrupted'
+
+def test_running_job_holding_lock_is_running(job_path):
+    lock = jobs._try_lock(os.path.join(job_path, 'run.lock'))
+    try:
+        assert jobs.is_running(job_path)
+        assert jobs.get_status(job_path)['state'] == 'running'
+    finally:
+        jobs._release(lock)
+
+def test_queued_job_of_dead_owner_is_interrupted(job_path):
+    jobs.write_status(job_path, state='queued', owner='f' * 32)
+    assert jobs.get_status(job_path)['state'] == 'interrupted'
+
+    # Jobs queued by this live process stay queued
+    jobs.write_status(job_path, state='queued', owner=jobs._owner_id())
+    assert jobs.get_status(job_path)['state'] == 'queued'
+
+def test_run_skips_finished_job(job_path, monkeypatch):
+    monkeypatch.setattr(bulk, 'run', lambda **kwargs: pytest.fail('a finished job was run again'))
+    jobs.write_status(job_path, state='done')
+
+    jobs._run(job_path)
+    assert jobs.get_status(job_path)['state'] == 'done'
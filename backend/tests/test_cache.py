@@ -0,0 +1,130 @@
+"""
+Tests for the transcript/result caches and the local transcript fetcher.
+"""
+import importlib
+import os
+import time
+
+import pytest
+
+import cache
+import transcripts
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+@pytest.fixture
+def cache_module(tmp_path, monkeypatch):
+    """
+    The cache module reloaded against a temporary SQLite file.
+    """
+    monkeypatch.setenv('SENTIMENT_CACHE_PATH', str(tmp_path / 'cache.sqlite3'))
+    yield importlib.reload(cache)
+    monkeypatch.delenv('SENTIMENT_CACHE_PATH')
+    importlib.reload(cache)
+
+def test_lru_evicts_least_recently_used_by_size():
+    lru = cache.LRUCache(max_bytes=20)
+    lru.set('a', 1, size=10, ttl=60)
+    lru.set('b', 2, size=10, ttl=60)
+    lru.get('a')  # 'b' becomes the least recently used entry
+    lru.set('c', 3, size=10, ttl=60)
+
+    assert lru.get('a') == 1
+    assert lru.get('b') is None
+    assert lru.get('c') == 3
+    assert lru.current_bytes == 20
+
+def test_lru_skips_entries_larger_than_budget():
+    lru = cache.LRUCache(max_bytes=5)
+    lru.set('big', 'value', size=6, ttl=60)
+
+    assert lru.get('big') is None
+    assert lru.current_bytes == 0
+
+def test_lru_too_large_value_replaces_old_one():
+    lru = cache.LRUCache(max_bytes=10)
+    lru.set('a', 'old', size=5, ttl=60)
+    lru.set('a', 'new', size=20, ttl=60)
+
+    assert lru.get('a') is None
+    assert lru.current_bytes == 0
+
+def test_lru_expires_entries():
+    lru = cache.LRUCache(max_bytes=100)
+    lru.set('a', 1, size=10, ttl=-1)
+
+    assert lru.get('a') is None
+    assert lru.current_bytes == 0
+
+def test_disk_hit_after_memory_is_lost(cache_module):
+    cache_module.transcript_cache.set('video', [{'text': 'hi'}])
+
+    # A new in-process cache, like another gunicorn worker sharing the same file
+    other = cache_module.TwoLevelCache('transcript', cache_module.DiskCache(cache_module.CACHE_PATH), ttl=60)
+
+    assert other.get('video') == [{'text': 'hi'}]
+    assert other.get('video') == [{'text': 'hi'}]
+    assert other.get('missing') is None
+    assert other.get_stats()['disk_hits'] == 1
+    assert other.get_stats()['memory_hits'] == 1
+    assert other.get_stats()['misses'] == 1
+
+def test_disk_entries_expire(cache_module):
+    expiring = cache_module.TwoLevelCache('result', cache_module.disk_cache, ttl=-1)
+    expiring.set('key', [1, 2, 3])
+    expiring.memory = cache_module.LRUCache(100)
+
+    assert expiring.get('key') is None
+
+def test_disk_hit_keeps_remaining_lifetime(cache_module):
+    short = cache_module.TwoLevelCache('result', cache_module.disk_cache, ttl=60)
+    short.set('key', [1])
+
+    # Another worker with a much longer TTL must not extend the entry's lifetime
+    other = cache_module.TwoLevelCache('result', cache_module.DiskCache(cache_module.CACHE_PATH), ttl=7 * 24 * 60 * 60)
+    assert other.get('key') == [1]
+    _, _, expires_at = other.memory._entries['key']
+    assert expires_at <= time.time() + 60
+
+def test_purge_expired_removes_rows(cache_module):
+    disk = cache_module.DiskCache(cache_module.CACHE_PATH, purge_every=2)
+    disk.set('ns', 'old', '1', ttl=-1)
+    disk.set('ns', 'new', '1', ttl=60)
+
+    rows = disk._connection().execute('SELECT key FROM cache').fetchall()
+    assert rows == [('new',)]
+
+def test_get_or_set_computes_once(cache_module):
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return {'value': 1}
+
+    assert cache_module.result_cache.get_or_set('k', compute) == {'value': 1}
+    assert cache_module.result_cache.get_or_set('k', compute) == {'value': 1}
+    assert len(calls) == 1
+
+def test_fixture_fetcher(monkeypatch):
+    monkeypatch.setenv('TRANSCRIPT_FIXTURE_DIR', FIXTURE_DIR)
+    fetcher = transcripts.get_fetcher()
+
+    assert isinstance(fetcher, transcripts.LocalTranscriptFetcher)
+    transcript = fetcher.fetch('fixture_video')
+    assert transcript[0]['text'] == 'this video is great'
+    assert transcript[-1]['start'] + transcript[-1]['duration'] == 10.0
+
+def test_fixture_fetcher_rejects_paths(monkeypatch):
+    monkeypatch.setenv('TRANSCRIPT_FIXTURE_DIR', FIXTURE_DIR)
+
+    with pytest.raises(ValueError):
+        transcripts.get_fetcher().fetch('../conftest')
+
+def test_fetcher_base_class_is_abstract():
+    with pytest.raises(TypeError):
+        transcripts.TranscriptFetcher()
+
+def test_fetcher_defaults_to_youtube(monkeypatch):
+    monkeypatch.delenv('TRANSCRIPT_FIXTURE_DIR', raising=False)
+
+    assert isinstance(transcripts.get_fetcher(), transcripts.YouTubeTranscriptFetcher)
@@ -0,0 +1,155 @@
+"""
+Tests for the micro-batching scheduler, with a stub model instead of torch.
+"""
+import threading
+import time
+
+import pytest
+
+from inference_scheduler import MicroBatchScheduler, QueueFullError
+
+@pytest.fixture
+def make_scheduler():
+    """
+    Creates schedulers and stops them at the end of the test.
+    """
+    schedulers = []
+
+    def make(predict_fn, **kwargs):
+        scheduler = MicroBatchScheduler(predict_fn, **kwargs)
+        schedulers.append(scheduler)
+        return scheduler
+
+    yield make
+    for scheduler in schedulers:
+        scheduler.stop()
+
+def test_results_keep_order_across_concurrent_submits(make_scheduler):
+    scheduler = make_scheduler(lambda items: [item * 2 for item in items], max_batch_size=4, max_wait_ms=20)
+    results = {}
+
+    def submit(offset):
+        items = list(range(offset, offset + 10))
+        results[offset] = scheduler.submit(items).result(timeout=5)
+
+    threads = [threading.Thread(target=submit, args=(offset,)) for offset in range(0, 80, 10)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    for offset, result in results.items():
+        assert result == [item * 2 for item in range(offset, offset + 10)]
+    assert len(results) == 8
+
+def test_batches_never_exceed_max_batch_size(make_scheduler):
+    batch_sizes = []
+
+    def predict(items):
+        batch_sizes.append(len(items))
+        return items
+
+    scheduler = make_scheduler(predict, max_batch_size=3, max_wait_ms=20)
+    futures = [scheduler.submit(list(range(7))) for _ in range(3)]
+
+    assert [future.result(timeout=5) for future in futures] == [list(range(7))] * 3
+    assert max(batch_sizes) <= 3
+    assert sum(batch_sizes) == 21
+
+def test_empty_submit_resolves_immediately(make_scheduler):
+    scheduler = make_scheduler(lambda items: items)
+
+    assert scheduler.submit([]).result(timeout=1) == []
+
+def test_queue_full_raises_and_takes_back_queued_items(make_scheduler):
+    release = threading.Event()
+
+    def predict(items):
+        release.wait()
+        return items
+
+    scheduler = make_scheduler(predict, max_batch_size=2, max_wait_ms=0, max_queue_size=4, submit_timeout=0.1)
+    first = scheduler.submit([1, 2])  # Taken by the worker, which blocks in predict
+    time.sleep(0.05)
+    queued = scheduler.submit([3, 4, 5, 6])  # Fills the queue
+
+    # Part of this request fits, the rest times out; the queued part is removed again
+    with pytest.raises(QueueFullError):
+        scheduler.submit([7, 8, 9])
+    assert scheduler.queue_size() == 4
+
+    release.set()
+    assert first.result(timeout=5) == [1, 2]
+    assert queued.result(timeout=5) == [3, 4, 5, 6]
+
+def test_queue_full_fails_the_request_future(make_scheduler):
+    release = threading.Event()
+    calls = []
+
+    def predict(items):
+        calls.append(list(items))
+        release.wait()
+        return items
+
+    scheduler = make_scheduler(predict, max_batch_size=2, max_wait_ms=0, max_queue_size=2, submit_timeout=0.1)
+
+    # The worker takes the first two items, then the queue fills up and the submit times out
+    with pytest.raises(QueueFullError):
+        scheduler.submit(list(range(10)))
+    release.set()
+    assert scheduler.submit([42]).result(timeout=5) == [42]
+
+    # Nothing of the failed request is run after it failed
+    assert calls[-1] == [42]
+    assert [0, 1] in calls and len(calls) <= 3
+
+def test_request_larger_than_queue_is_admitted_in_chunks(make_scheduler):
+    def predict(items):
+        time.sleep(0.02)
+        return items
+
+    # Admitting 40 items takes longer than the submit timeout, but every chunk makes progress
+    scheduler = make_scheduler(predict, max_batch_size=4, max_wait_ms=0, max_queue_size=4, submit_timeout=0.1)
+
+    assert scheduler.submit(list(range(40))).result(timeout=5) == list(range(40))
+
+def test_large_request_is_not_starved_by_small_ones(make_scheduler):
+    scheduler = make_scheduler(lambda items: items, max_batch_size=8, max_wait_ms=1, max_queue_size=16, submit_timeout=1)
+    stop = threading.Event()
+
+    def small_requests():
+        while not stop.is_set():
+            try:
+                scheduler.submit([0] * 4).result(timeout=5)
+            except QueueFullError:
+                pass
+
+    threads = [threading.Thread(target=small_requests) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    try:
+        assert scheduler.submit(list(range(100))).result(timeout=5) == list(range(100))
+    finally:
+        stop.set()
+        for thread in threads:
+            thread.join()
+
+def test_error_reaches_every_request_in_failed_batch(make_scheduler):
+    release = threading.Event()
+
+    def predict(items):
+        release.wait()
+        if 'bad' in items:
+            raise ValueError('model failed')
+        return items
+
+    scheduler = make_scheduler(predict, max_batch_size=8, max_wait_ms=50)
+    futures = [scheduler.submit(['ok', 'bad']), scheduler.submit(['ok']), scheduler.submit(['ok', 'ok'])]
+    release.set()
+
+    for future in futures:
+        with pytest.raises(ValueError):
+            future.result(timeout=5)
+
+    # The scheduler keeps working after a failed batch
+    assert scheduler.submit(['ok']).result(timeout=5) == ['ok']
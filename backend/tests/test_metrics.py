@@ -0,0 +1,60 @@
+"""
+Tests for the metrics shared between processes.
+"""
+import multiprocessing
+
+import pytest
+
+import metrics
+
+@pytest.fixture
+def shared_path(tmp_path, monkeypatch):
+    path = str(tmp_path / 'metrics.sqlite3')
+    monkeypatch.setattr(metrics.shared_store, 'path', path)
+    return path
+
+def record_in_child(stage: str, seconds: float):
+    metrics.stage_seconds.observe(stage, seconds)
+    metrics.cache_events.inc('result', 'misses')
+    metrics.shared_store.flush()
+
+def sample(page: str, prefix: str) -> float:
+    lines = [line for line in page.splitlines() if line.startswith(prefix + ' ')]
+    return float(lines[0].rsplit(' ', 1)[1]) if lines else 0
+
+@pytest.mark.skipif('fork' not in multiprocessing.get_all_start_methods(), reason='needs fork')
+def test_render_adds_up_all_processes(shared_path):
+    metrics.stage_seconds.observe('shared_test', 0.5)
+    misses_before = sample(metrics.render(), 'sentiment_cache_events_total{cache="result",event="misses"}')
+
+    child = multiprocessing.get_context('fork').Process(target=record_in_child, args=('shared_test', 2.0))
+    child.start()
+    child.join()
+    assert child.exitcode == 0
+
+    page = metrics.render()
+    assert sample(page, 'sentiment_stage_seconds_count{stage="shared_test"}') == 2
+    assert sample(page, 'sentiment_stage_seconds_sum{stage="shared_test"}') == 2.5
+    assert sample(page, 'sentiment_stage_seconds_bucket{stage="shared_test",le="1"}') == 1
+    assert sample(page, 'sentiment_cache_events_total{cache="result",event="misses"}') == misses_before + 1
+
+def test_live_process_publishes_its_totals_again_after_reset(shared_path):
+    metrics.request_size.observe('shared_test_unit', 10)
+    assert sample(metrics.render(), 'sentiment_request_size_count{unit="shared_test_unit"}') == 1
+
+    # Reset drops the rows; a process that keeps running writes its full totals again
+    metrics.shared_store.reset()
+    metrics.request_size.observe('shared_test_unit', 10)
+    assert sample(metrics.render(), 'sentiment_request_size_count{unit="shared_test_unit"}') == 2
+
+def test_merge_adds_series():
+    merged = metrics.Histogram.merge([{'a': [1, 2, 3.0, 2]}, {'a': [0, 1, 1.0, 1], 'b': [1, 1, 0.5, 1]}])
+
+    assert merged == {'a': [1, 3, 4.0, 3], 'b': [1, 1, 0.5, 1]}
+    assert metrics.Counter.merge([{'x': 1}, {'x': 2, 'y': 1}]) == {'x': 3, 'y': 1}
+
+def test_render_falls_back_to_this_process(tmp_path, monkeypatch):
+    monkeypatch.setattr(metrics.shared_store, 'path', str(tmp_path / 'missing' / 'metrics.sqlite3'))
+    metrics.stage_seconds.observe('fallback_test', 0.1)
+
+    assert 'sentiment_stage_seconds_count{stage="fallback_test"} 1' in metrics.render()
@@ -0,0 +1,101 @@
+"""
+Tests for the streaming segmentation and the error records of streamed responses.
+"""
+import json
+import random
+
+import pytest
+
+import model_util
+from inference_scheduler import QueueFullError
+
+def random_text(rng: random.Random) -> str:
+    # Includes empty words from repeated, leading and trailing spaces
+    words = [rng.choice(['good', 'bad', 'movie', '']) for _ in range(rng.randint(0, 60))]
+    return ' '.join(words)
+
+def random_captions(rng: random.Random) -> list:
+    captions = []
+    start = rng.uniform(0, 30)
+    for _ in range(rng.randint(0, 40)):
+        captions.append({'text': rng.choice(['hello', 'world', '']), 'start': start, 'duration': 2.0})
+        # Occasional long pauses leave empty segments in between
+        start += rng.choice([0.5, 2.0, 3.0, 45.0])
+    return captions
+
+def list_caption_segments(data: list, second: int, monkeypatch) -> list:
+    """
+    Runs `get_segmented_sentiment_youtubecaption` with the model replaced, returning its segments.
+    """
+    captured = []
+
+    def fake_batched_sentiment(texts, use_custom_model):
+        captured.extend(texts)
+        return [[0.0, 0.0]] * len(texts)
+
+    monkeypatch.setattr(model_util, 'get_batched_sentiment', fake_batched_sentiment)
+    results = model_util.get_segmented_sentiment_youtubecaption(data=data, second=second, use_custom_model=False)
+    return [(text, result[2]) for text, result in zip(captured, results)]
+
+@pytest.mark.parametrize('seed', range(50))
+def test_wordcount_segments_match_chunk_text(seed):
+    rng = random.Random(seed)
+    text = random_text(rng)
+    max_word_count = rng.randint(1, 10)
+
+    expected = model_util.chunk_text(text=text, max_word_count=max_word_count, overlap=0)
+    segments = list(model_util.iter_wordcount_segments(text, max_word_count))
+
+    assert [text for text, _ in segments] == expected
+    assert [index for _, index in segments] == [i * max_word_count for i in range(len(expected))]
+
+def test_wordcount_segments_keep_trailing_space():
+    assert list(model_util.iter_wordcount_segments('a b ', 2)) == [('a b', 0), ('', 2)]
+    assert list(model_util.iter_wordcount_segments('', 5)) == [('', 0)]
+
+@pytest.mark.parametrize('seed', range(50))
+def test_caption_segments_match_list_version(seed, monkeypatch):
+    rng = random.Random(seed)
+    data = random_captions(rng)
+    second = rng.choice([5, 20, 60])
+
+    assert list(model_util.iter_youtubecaption_segments(iter(data), second)) == list_caption_segments(data, second, monkeypatch)
+
+def test_caption_gaps_give_empty_segments(monkeypatch):
+    data = [
+        {'text': 'first', 'start': 1.0, 'duration': 1.0},
+        {'text': 'last', 'start': 65.0, 'duration': 1.0},
+    ]
+
+    segments = list(model_util.iter_youtubecaption_segments(iter(data), 20))
+    assert segments == [('first ', 1.0), ('', -1), ('', -1), ('last ', 65.0)]
+    assert segments == list_caption_segments(data, 20, monkeypatch)
+
+@pytest.fixture
+def flask_app():
+    pytest.importorskip('flask')
+    import app
+    return app
+
+def failing_results(error: Exception):
+    yield [0.1, 0.9, 0]
+    raise error
+
+def read_stream(flask_app, accept: str, error: Exception) -> str:
+    with flask_app.app.test_request_context(headers={'Accept': accept}):
+        response = flask_app.stream_response(failing_results(error))
+    return b''.join(response.iter_encoded()).decode('utf-8')
+
+def test_ndjson_stream_ends_with_error_record(flask_app):
+    lines = read_stream(flask_app, 'application/x-ndjson', QueueFullError('full')).splitlines()
+
+    assert json.loads(lines[0]) == [0.1, 0.9, 0]
+    assert json.loads(lines[-1]) == {'error': 'Server is busy, please try again later'}
+
+def test_sse_stream_ends_with_error_event(flask_app):
+    body = read_stream(flask_app, 'text/event-stream', RuntimeError('boom'))
+    events = body.strip().split('\n\n')
+
+    assert events[0] == 'data: [0.1, 0.9, 0]'
+    assert events[-1] == 'event: error\ndata: {"error": "Analysis failed"}'
+    assert 'event: end' not in body
@@ -0,0 +1,93 @@
+"""
+Tests for the token windows and the per-request window dedup, with a fake tokenizer and model.
+"""
+import re
+
+import pytest
+
+import model_util
+from model_registry import ModelRegistry
+
+def whitespace_tokens(text: str):
+    # Every word is one token, its id the word length, so equal length words are the same token
+    spans = [match.span() for match in re.finditer(r'\S+', text)]
+    return [end - start for start, end in spans], spans
+
+class FakeTokenizer:
+    def __call__(self, texts, **kwargs):
+        encoded = [whitespace_tokens(text) for text in texts]
+        return {'input_ids': [ids for ids, _ in encoded], 'offset_mapping': [offsets for _, offsets in encoded]}
+
+class FakeModel:
+    """
+    Scores a window by its text length and records every text it is called on.
+    """
+    def __init__(self):
+        self.calls = []
+
+    def predict(self, texts):
+        self.calls.append(list(texts))
+        return [len(text) / 100 for text in texts]
+
+@pytest.fixture
+def fake_model(monkeypatch):
+    model = FakeModel()
+    registry = ModelRegistry()
+    registry.register('tokenizer', FakeTokenizer)
+    registry.register('custom', lambda: model)
+    monkeypatch.setattr(model_util, 'registry', registry)
+    monkeypatch.setattr(model_util, 'USE_SCHEDULER', False)
+    monkeypatch.setattr(model_util, 'WINDOW_MODE', 'token')
+    monkeypatch.setattr(model_util, 'CUSTOM_POOL_WORKERS', 0)
+    return model
+
+def test_short_text_is_one_window():
+    text = 'a bb ccc'
+    windows = model_util.windows_from_tokens(text, *whitespace_tokens(text), max_tokens=5, stride=3)
+
+    assert windows == [model_util.Window(text='a bb ccc', input_ids=[1, 2, 3])]
+
+def test_windows_slide_by_stride_and_stop_at_the_end():
+    text = 'a bb ccc dddd eeeee ffffff'
+    windows = model_util.windows_from_tokens(text, *whitespace_tokens(text), max_tokens=3, stride=2)
+
+    assert [w.input_ids for w in windows] == [[1, 2, 3], [3, 4, 5], [5, 6]]
+    # Texts are cut from the original string by offset, keeping the spaces between tokens
+    assert [w.text for w in windows] == ['a bb ccc', 'ccc dddd eeeee', 'eeeee ffffff']
+
+def test_no_window_is_contained_in_the_previous_one():
+    text = 'a bb ccc dddd'
+    windows = model_util.windows_from_tokens(text, *whitespace_tokens(text), max_tokens=3, stride=1)
+
+    # The second window reaches the end, so there is no third [3, 4] window
+    assert [w.input_ids for w in windows] == [[1, 2, 3], [2, 3, 4]]
+
+def test_empty_text_is_one_empty_window():
+    assert model_util.windows_from_tokens('', [], []) == [model_util.Window(text='', input_ids=[])]
+    assert model_util.windows_from_tokens('   ', [], []) == [model_util.Window(text='', input_ids=[])]
+
+def test_identical_windows_reach_the_model_once(fake_model):
+    texts = ['great movie', 'bad', 'great movie', 'bad']
+    probabilities = model_util.get_batched_sentiment(texts=texts, use_custom_model=True)
+
+    assert fake_model.calls == [['great movie', 'bad']]
+    assert probabilities[0] == probabilities[2] == pytest.approx([0.89, 0.11])
+    assert probabilities[1] == probabilities[3] == pytest.approx([0.97, 0.03])
+
+def test_texts_average_their_windows(fake_model):
+    text = ' '.join(['word'] * 150 + ['longerword'] * 50)
+    windows = model_util.windows_from_tokens(text, *whitespace_tokens(text))
+    assert len(windows) > 1
+
+    [probability] = model_util.get_batched_sentiment(texts=[text], use_custom_model=True)
+
+    positive = sum(len(w.text) / 100 for w in windows) / len(windows)
+    assert probability == pytest.approx([1 - positive, positive])
+
+def test_window_memo_is_shared_across_calls(fake_model):
+    memo = {}
+    model_util.get_batched_sentiment(texts=['ok', 'fine'], use_custom_model=True, window_memo=memo)
+    model_util.get_batched_sentiment(texts=['fine', 'awful'], use_custom_model=True, window_memo=memo)
+    model_util.get_batched_sentiment(texts=['ok'], use_custom_model=True, window_memo=memo)
+
+    assert fake_model.calls == [['ok', 'fine'], ['awful']]
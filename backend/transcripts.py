@@ -0,0 +1,61 @@
+"""
+Pluggable transcript fetchers for the YouTube endpoint.
+
+The app uses `YouTubeTranscriptFetcher` by default. Setting the TRANSCRIPT_FIXTURE_DIR
+environment variable switches to `LocalTranscriptFetcher`, which reads transcripts from
+`<dir>/<video_id>.json` instead of the network (useful for tests and benchmarks).
+"""
+import json
+import os
+from abc import ABC, abstractmethod
+from typing import List
+
+class TranscriptFetcher(ABC):
+    """
+    Base class for transcript fetchers.
+    """
+    @abstractmethod
+    def fetch(self, video_id: str) -> List[dict]:
+        """
+        Fetches the transcript of a video.
+
+        Args:
+        - video_id (str): The YouTube video ID.
+
+        Returns:
+        - List[dict]: Caption segments with "text", "start" and "duration" fields.
+        """
+
+class YouTubeTranscriptFetcher(TranscriptFetcher):
+    """
+    Fetches transcripts from YouTube using `youtube_transcript_api`.
+    """
+    def fetch(self, video_id: str) -> List[dict]:
+        from youtube_transcript_api import YouTubeTranscriptApi
+        return YouTubeTranscriptApi.get_transcript(video_id)
+
+class LocalTranscriptFetcher(TranscriptFetcher):
+    """
+    Reads transcripts from JSON files in a local directory, as a stand-in for the network.
+    """
+    def __init__(self, directory: str):
+        self.directory = directory
+
+    def fetch(self, video_id: str) -> List[dict]:
+        # Only plain file names are allowed, so a video ID cannot escape the directory
+        if os.path.basename(video_id) != video_id:
+            raise ValueError(f'Invalid video id: {video_id}')
+        with open(os.path.join(self.directory, f'{video_id}.json'), encoding='utf-8') as file:
+            return json.load(file)
+
+def get_fetcher() -> TranscriptFetcher:
+    """
+    Creates the transcript fetcher selected by the environment.
+
+    Returns:
+    - TranscriptFetcher: A local fetcher if TRANSCRIPT_FIXTURE_DIR is set, otherwise the YouTube fetcher.
+    """
+    fixture_dir = os.environ.get('TRANSCRIPT_FIXTURE_DIR')
+    if fixture_dir:
+        return LocalTranscriptFetcher(fixture_dir)
+    return YouTubeTranscriptFetcher()
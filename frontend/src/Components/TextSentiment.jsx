@@ -1,5 +1,5 @@
 import React, { useState } from "react"
-import axios from "axios"
+import { postNdjson } from "../streamNdjson"
 import { LineChart, Line, CartesianGrid, XAxis, YAxis, Tooltip, ResponsiveContainer } from "recharts"
 
 // Constants for model selection states
@@ -18,7 +18,7 @@ function TextSentiment() {
 
   /**
    * Handles the submission of the text input for sentiment analysis
-   * Sends a POST request to the Flask backend and updates the sentiment state
+   * Streams the results from the Flask backend and progressively updates the sentiment state
    */
   const handleSubmit = async () => {
     // Validate that the input is not empty
@@ -28,16 +28,18 @@ function TextSentiment() {
     }
 
     try {
-      // Send the text and selected model info to the backend
-      const response = await axios.post("/api/analyze-text-prog", {
-        text: input,
-        use_custom_model: selectedModel === CUSTOM_MODEL_STATE,
-      })
-
-      console.log("Response from Flask:", response.data)
-
-      // Update the sentiment data with the results from the backend
-      setSentiment(response.data.result)
+      // Clear the previous results; points are added to the chart as segments are scored
+      setSentiment([])
+
+      // Send the text and selected model info to the backend and stream the results back
+      await postNdjson(
+        "/api/analyze-text-prog/stream",
+        {
+          text: input,
+          use_custom_model: selectedModel === CUSTOM_MODEL_STATE,
+        },
+        (segment) => setSentiment((previous) => [...previous, segment])
+      )
     } catch (error) {
       console.error("Some random error happened:", error)
       alert("Unexpected error occurred.")
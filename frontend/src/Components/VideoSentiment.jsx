@@ -1,5 +1,5 @@
 import React, { useState } from "react"
-import axios from "axios"
+import { postNdjson } from "../streamNdjson"
 import { LineChart, Line, CartesianGrid, XAxis, YAxis, Tooltip, ResponsiveContainer } from "recharts"
 
 // Constants for model selection states
@@ -18,7 +18,7 @@ function VideoSentiment() {
 
   /**
    * Handles the submission of the video ID for sentiment analysis
-   * Sends a POST request to the Flask backend and updates the video sentiment state
+   * Streams the results from the Flask backend and progressively updates the video sentiment state
    */
   const handleVideoSubmit = async () => {
     // Validate that the video ID input is not empty
@@ -28,16 +28,18 @@ function VideoSentiment() {
     }
 
     try {
-      // Send the video ID and selected model info to the backend
-      const response = await axios.post("/api/analyze-youtube", {
-        video_id: videoId,
-        use_custom_model: selectedModel === CUSTOM_MODEL_STATE,
-      })
-
-      console.log("Response from Flask (video):", response.data)
-
-      // Update the video sentiment data with the results from the backend
-      setVideoSentiment(response.data.result)
+      // Clear the previous results; points are added to the chart as segments are scored
+      setVideoSentiment([])
+
+      // Send the video ID and selected model info to the backend and stream the results back
+      await postNdjson(
+        "/api/analyze-youtube/stream",
+        {
+          video_id: videoId,
+          use_custom_model: selectedModel === CUSTOM_MODEL_STATE,
+        },
+        (segment) => setVideoSentiment((previous) => [...previous, segment])
+      )
     } catch (error) {
       console.error("Error in video analysis:", error)
       alert("Unexpected error occurred.")
@@ -0,0 +1,48 @@
+/**
+ * Sends a JSON payload to a streaming endpoint and calls onItem for every NDJSON line as it arrives
+ * @param {string} url - The streaming API endpoint
+ * @param {object} payload - The JSON body of the POST request
+ * @param {function} onItem - Called with each parsed line of the response
+ * @throws {Error} If the request fails or the server ends the stream with an error record
+ */
+export async function postNdjson(url, payload, onItem) {
+  const response = await fetch(url, {
+    method: "POST",
+    headers: { "Content-Type": "application/json", Accept: "application/x-ndjson" },
+    body: JSON.stringify(payload),
+  })
+
+  if (!response.ok) {
+    throw new Error(`Request failed with status ${response.status}`)
+  }
+
+  // The server reports errors raised mid-stream as a final {"error": ...} line
+  const handleLine = (line) => {
+    const item = JSON.parse(line)
+    if (item && !Array.isArray(item) && typeof item === "object" && "error" in item) {
+      throw new Error(item.error)
+    }
+    onItem(item)
+  }
+
+  const reader = response.body.getReader()
+  const decoder = new TextDecoder()
+  let buffer = ""
+
+  // Parse every complete line; keep a trailing partial line in the buffer until more data arrives
+  while (true) {
+    const { done, value } = await reader.read()
+    if (done) break
+
+    buffer += decoder.decode(value, { stream: true })
+    const lines = buffer.split("\n")
+    buffer = lines.pop()
+
+    for (const line of lines) {
+      if (line.trim()) handleLine(line)
+    }
+  }
+
+  buffer += decoder.decode()
+  if (buffer.trim()) handleLine(buffer)
+}